@@ -1,6 +1,7 @@
 from django.contrib import admin
-from .models import Pass, Staff
+from .models import Pass, Staff, ScanEvent
 from django.utils.html import format_html
+from . import qrrender, qrsign
 
 @admin.register(Pass)
 class PassAdmin(admin.ModelAdmin):
@@ -8,8 +9,8 @@ class PassAdmin(admin.ModelAdmin):
 	readonly_fields = ("qr_preview",)
 
 	def qr_preview(self, obj):
-		if obj.qr_code_image:
-			return format_html('<img src="{}" width="100" />', obj.qr_code_image.url)
+		if obj.pk:
+			return format_html('<img src="{}" width="100" />', qrrender.url(qrsign.pass_payload(obj, obj.staff.location)))
 		return "No QR"
 	qr_preview.short_description = "QR Code"
 
@@ -30,3 +31,10 @@ class StaffAdmin(admin.ModelAdmin):
     printed_status.short_description = 'Printed'
 admin.site.register(Staff, StaffAdmin)
 
+
+
+@admin.register(ScanEvent)
+class ScanEventAdmin(admin.ModelAdmin):
+    list_display = ('scanned_at', 'kind', 'code', 'result', 'gate', 'location')
+    list_filter = ('result', 'kind', 'gate', 'location')
+    date_hierarchy = 'scanned_at'
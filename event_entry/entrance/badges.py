@@ -0,0 +1,218 @@
+# entrance/badges.py
+"""
+Print-sheet imposition: lay out N badges per A4/A3 page.
+
+Each badge combines the staff QR, name, booth, location and a colour
+band for the staff type. Pages are rendered in a process pool (the
+workers only receive plain dicts and file paths, no Django objects) and
+written one at a time, either appended to a single PDF or saved as
+numbered PNG sheets, so memory stays at roughly one page per worker.
+"""
+import io
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from PIL import Image, ImageDraw, ImageFont
+
+
+DPI = 150
+# Paper sizes in millimetres (portrait)
+PAPER_SIZES_MM = {
+    'A4': (210, 297),
+    'A3': (297, 420),
+}
+TYPE_COLORS = {
+    'VIP': (217, 119, 6),
+    'Staff': (29, 78, 216),
+}
+DEFAULT_COLOR = (55, 65, 81)
+PAGE_MARGIN_MM = 8
+GUTTER_MM = 4
+
+
+def _mm(value):
+    return int(round(value / 25.4 * DPI))
+
+
+def page_pixels(paper):
+    width_mm, height_mm = PAPER_SIZES_MM[paper]
+    return _mm(width_mm), _mm(height_mm)
+
+
+def grid_for(per_page, paper):
+    """
+    Pick (cols, rows) for per_page badges that gives the largest badge
+    whose shorter side is as long as possible.
+    """
+    width, height = page_pixels(paper)
+    best = None
+    for cols in range(1, per_page + 1):
+        rows = math.ceil(per_page / cols)
+        cell = min(width / cols, height / rows)
+        if best is None or cell > best[0]:
+            best = (cell, cols, rows)
+    return best[1], best[2]
+
+
+def _font(size, bold=False, font_path=None):
+    name = font_path or ('DejaVuSans-Bold.ttf' if bold else 'DejaVuSans.ttf')
+    try:
+        return ImageFont.truetype(name, size)
+    except OSError:
+        try:
+            return ImageFont.load_default(size=size)
+        except TypeError:
+            # Pillow < 10.1 has no sized default font
+            return ImageFont.load_default()
+
+
+def _fit_text(draw, text, font, max_width):
+    if draw.textlength(text, font=font) <= max_width:
+        return text
+    while text and draw.textlength(text + '…', font=font) > max_width:
+        text = text[:-1]
+    return text + '…'
+
+
+def render_badge(badge, width, height, font_path=None):
+    """
+    badge: {'name', 'staff_type', 'booth_id', 'location_display', 'qr_path'}
+    font_path: TrueType font for the name/info lines (e.g. one that
+    covers Ethiopic script); DejaVu Sans or Pillow's default otherwise.
+    """
+    image = Image.new('RGB', (width, height), 'white')
+    draw = ImageDraw.Draw(image)
+    color = TYPE_COLORS.get(badge['staff_type'], DEFAULT_COLOR)
+    pad = max(4, width // 20)
+
+    # Colour band with the staff type
+    band = max(12, height // 7)
+    draw.rectangle([0, 0, width, band], fill=color)
+    type_font = _font(int(band * 0.6), bold=True)
+    draw.text((width // 2, band // 2), badge['staff_type'] or '', fill='white', font=type_font, anchor='mm')
+
+    # QR code, kept sharp with nearest-neighbour scaling
+    text_block = height // 4
+    qr_side = max(16, min(width - 2 * pad, height - band - text_block - 2 * pad))
+    with Image.open(badge['qr_path']) as qr:
+        qr = qr.convert('RGB').resize((qr_side, qr_side), Image.NEAREST)
+        image.paste(qr, ((width - qr_side) // 2, band + pad))
+
+    # Name, then booth and location
+    y = band + pad + qr_side + pad // 2
+    name_font = _font(max(10, text_block // 3), bold=True, font_path=font_path)
+    info_font = _font(max(8, text_block // 5), font_path=font_path)
+    name = _fit_text(draw, badge['name'] or '', name_font, width - 2 * pad)
+    draw.text((width // 2, y), name, fill='black', font=name_font, anchor='ma')
+    y += int(text_block / 2.4)
+    info = f"Booth {badge['booth_id'] or 'N/A'} · {badge['location_display'] or ''}"
+    draw.text((width // 2, y), _fit_text(draw, info, info_font, width - 2 * pad), fill=(55, 65, 81), font=info_font, anchor='ma')
+
+    # Cut line
+    draw.rectangle([0, 0, width - 1, height - 1], outline=(203, 213, 225))
+    return image
+
+
+def render_page(badges, paper, per_page, font_path=None):
+    """
+    Process-pool worker: render one page and return it as PNG bytes.
+    """
+    width, height = page_pixels(paper)
+    cols, rows = grid_for(per_page, paper)
+    margin, gutter = _mm(PAGE_MARGIN_MM), _mm(GUTTER_MM)
+    cell_w = (width - 2 * margin - (cols - 1) * gutter) // cols
+    cell_h = (height - 2 * margin - (rows - 1) * gutter) // rows
+
+    page = Image.new('RGB', (width, height), 'white')
+    for index, badge in enumerate(badges):
+        col, row = index % cols, index // cols
+        x = margin + col * (cell_w + gutter)
+        y = margin + row * (cell_h + gutter)
+        page.paste(render_badge(badge, cell_w, cell_h, font_path), (x, y))
+
+    out = io.BytesIO()
+    page.save(out, format='PNG')
+    return out.getvalue()
+
+
+def render_sheets(badges, output, fmt='pdf', paper='A4', per_page=8, workers=None, font_path=None):
+    """
+    Render badges (list of dicts, see render_badge) into output.
+    fmt='pdf': output is a file path, pages are appended one by one.
+    fmt='png': output is a directory, pages are sheet_001.png, ...
+    Returns the list of files written.
+    """
+    if paper not in PAPER_SIZES_MM:
+        raise ValueError(f"Unknown paper size {paper!r}")
+    pages = [badges[i:i + per_page] for i in range(0, len(badges), per_page)]
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    output = Path(output)
+    if fmt == 'png':
+        output.mkdir(parents=True, exist_ok=True)
+    else:
+        output.parent.mkdir(parents=True, exist_ok=True)
+
+    def rendered():
+        if workers <= 1 or len(pages) <= 1:
+            for page in pages:
+                yield render_page(page, paper, per_page, font_path)
+        else:
+            with ProcessPoolExecutor(max_workers=min(workers, len(pages))) as pool:
+                count = len(pages)
+                yield from pool.map(render_page, pages, [paper] * count, [per_page] * count, [font_path] * count)
+
+    written = []
+    for number, png in enumerate(rendered(), start=1):
+        if fmt == 'png':
+            path = output / f"sheet_{number:03d}.png"
+            path.write_bytes(png)
+            written.append(path)
+        else:
+            with Image.open(io.BytesIO(png)) as page:
+                page.save(output, format='PDF', resolution=DPI, append=number > 1)
+            written = [output]
+    return written
+
+
+def print_staff(staff_qs, output, fmt='pdf', paper='A4', per_page=8, workers=None, mark_printed=True):
+    """
+    Render badges for every staff in staff_qs and, unless mark_printed is
+    False, flag exactly those staff as printed with one UPDATE.
+    Returns (files written, number of staff printed).
+    """
+    from django.conf import settings
+    from .models import Staff
+    from .qrsign import staff_payload
+    from .signals import staff_bulk_changed
+    from .utils import generate_qr_batch
+
+    # Snapshot the selection so the UPDATE matches what was rendered
+    staff_list = list(
+        staff_qs.order_by('location', 'booth_id', 'name')
+        .only('id', 'name', 'staff_type', 'booth_id', 'location')
+    )
+    qr_paths = generate_qr_batch({s.staff_code: staff_payload(s) for s in staff_list}, workers=workers)
+    badges = [
+        {
+            'name': s.name,
+            'staff_type': s.staff_type,
+            'booth_id': s.booth_id,
+            'location_display': s.get_location_display(),
+            'qr_path': qr_paths[s.staff_code],
+        }
+        for s in staff_list
+    ]
+
+    written = render_sheets(
+        badges, output, fmt=fmt, paper=paper, per_page=per_page, workers=workers,
+        font_path=getattr(settings, 'BADGE_FONT_PATH', None),
+    )
+
+    if mark_printed and staff_list:
+        Staff.objects.filter(id__in=[s.id for s in staff_list]).update(printed=True)
+        staff_bulk_changed.send(sender=Staff)
+    return written, len(staff_list)
@@ -0,0 +1,86 @@
+# entrance/booths.py
+"""
+Precomputed location -> booth -> counters tree for booth_files.
+
+The whole tree comes from one GROUP BY over Staff and is kept per worker
+until a Staff row changes (see entrance.signals) or BOOTH_TREE_CACHE_TTL
+seconds pass, so the page renders with a constant number of queries.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.db.models import Count, Q
+
+from .models import Staff
+
+
+_lock = threading.Lock()
+# (tree, built_at monotonic time), swapped as one object so readers never
+# see a tree from one build paired with the timestamp of another (or None)
+_cached = None
+
+
+def build_tree():
+    """
+    Return [{code, name, booths: [{name, staff_count, printed_count,
+    sold_count, photo_count}, ...]}, ...] sorted by location and booth.
+    """
+    rows = (
+        Staff.objects
+        .values('location', 'booth_id')
+        .annotate(
+            staff_count=Count('id'),
+            printed_count=Count('id', filter=Q(printed=True)),
+            sold_count=Count('id', filter=Q(sold=True)),
+            photo_count=Count('id', filter=Q(photo__isnull=False) & ~Q(photo='')),
+        )
+        .order_by('location', 'booth_id')
+    )
+
+    location_names = dict(Staff.LOCATION_CHOICES)
+    locations = []
+    by_code = {}
+    for row in rows:
+        loc_code = row['location']
+        if not loc_code or not row['booth_id']:
+            continue
+        location = by_code.get(loc_code)
+        if location is None:
+            location = {
+                "code": loc_code,
+                "name": location_names.get(loc_code, loc_code),
+                "booths": [],
+            }
+            by_code[loc_code] = location
+            locations.append(location)
+        location["booths"].append({
+            "name": row['booth_id'],
+            "staff_count": row['staff_count'],
+            "printed_count": row['printed_count'],
+            "sold_count": row['sold_count'],
+            "photo_count": row['photo_count'],
+        })
+    return locations
+
+
+def get_tree():
+    """
+    Cached build_tree(). Callers must treat the result as read-only.
+    """
+    global _cached
+    ttl = getattr(settings, 'BOOTH_TREE_CACHE_TTL', 60)
+    cached = _cached
+    if cached is not None and time.monotonic() - cached[1] <= ttl:
+        return cached[0]
+
+    tree = build_tree()
+    with _lock:
+        _cached = (tree, time.monotonic())
+    return tree
+
+
+def invalidate():
+    global _cached
+    with _lock:
+        _cached = None
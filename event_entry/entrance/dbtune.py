@@ -0,0 +1,39 @@
+# entrance/dbtune.py
+"""
+SQLite connection tuning (SQLITE_PRAGMAS).
+
+Applied from a connection_created receiver so it covers runserver,
+WSGI/ASGI workers and management commands alike. journal_mode=WAL is
+stored in the database file; the other pragmas are per connection.
+"""
+import re
+
+from django.conf import settings
+
+
+_NAME = re.compile(r'^[a-z_]+$')
+_VALUE = re.compile(r'^-?[\w.]+$')
+
+
+def pragma_statements(pragmas=None):
+    """
+    PRAGMA statements for pragmas (default: the SQLITE_PRAGMAS setting).
+    """
+    if pragmas is None:
+        pragmas = getattr(settings, 'SQLITE_PRAGMAS', {})
+    statements = []
+    for name, value in pragmas.items():
+        # PRAGMA takes no bound parameters, so only allow plain tokens
+        if not _NAME.match(name) or not _VALUE.match(str(value)):
+            raise ValueError(f"Invalid SQLite pragma {name}={value!r}")
+        statements.append(f"PRAGMA {name}={value}")
+    return statements
+
+
+def apply(cursor, pragmas=None):
+    """
+    Run the pragmas on a DB-API cursor (Django or plain sqlite3).
+    """
+    for statement in pragma_statements(pragmas):
+        cursor.execute(statement)
+
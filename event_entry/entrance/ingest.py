@@ -0,0 +1,142 @@
+# entrance/ingest.py
+"""
+Batched Staff ingest shared by import_staff and update_staff_from_cleaned.
+
+One CSV row used to mean one or two autocommits (create + QR save). Here
+all rows are normalized in memory, matched against a preloaded
+staff_code_sheet -> Staff dict, and written with bulk_create/bulk_update
+in chunks inside a single transaction. QR images are generated after the
+DB writes and attached with one more bulk_update.
+"""
+import os
+
+from django.conf import settings
+from django.db import transaction
+
+from .models import Staff
+from .utils import generate_qr_batch, store_qr_files
+from .qrsign import staff_payload
+from .signals import staff_bulk_changed
+
+
+STAFF_FIELDS = ('name', 'booth_id', 'phone_number', 'location', 'staff_type', 'sold')
+
+
+def normalize_row(row):
+    """
+    Turn a CSV row (Name, Booth ID, Staff Code, Phone no, Location,
+    Staff Type, optional Sold) into Staff field values.
+    'sold' is only present when the CSV has a Sold column.
+    """
+    name = (row.get('Name') or '').strip() or 'Unknown'
+    booth_id = (row.get('Booth ID') or '').strip() or None
+    staff_code_sheet = (row.get('Staff Code') or '').strip() or None
+    phone_no = (row.get('Phone no') or '').strip()
+    location = (row.get('Location') or '').strip() or '1p'
+    staff_type = (row.get('Staff Type') or '').strip() or 'Staff'
+
+    # Normalize phone number
+    phone_no = ''.join(filter(str.isdigit, phone_no)) if phone_no else 'N/A'
+
+    # Validate location
+    if location not in dict(Staff.LOCATION_CHOICES):
+        location = '1p'
+
+    # Normalize staff_type (Sales/Staff/anything else -> Staff)
+    staff_type = 'VIP' if staff_type.upper() == 'VIP' else 'Staff'
+
+    values = {
+        'name': name,
+        'booth_id': booth_id,
+        'phone_number': phone_no,
+        'location': location,
+        'staff_type': staff_type,
+        'staff_code_sheet': staff_code_sheet,
+    }
+    if 'Sold' in row:
+        values['sold'] = (row.get('Sold') or '').strip().lower() in ('yes', 'y', 'true', '1')
+    return values
+
+
+def upsert_staff(records, batch_size=500, match_existing=True):
+    """
+    Write normalized records (see normalize_row) in bulk.
+
+    Records whose staff_code_sheet already exists are updated in place
+    (only changed fields); everything else is created. With
+    match_existing=False every record is created.
+
+    Returns (created, updated, unchanged) where created is the list of
+    new Staff instances.
+    """
+    existing = {}
+    if match_existing:
+        existing = {
+            s.staff_code_sheet: s
+            for s in Staff.objects.filter(staff_code_sheet__isnull=False).only('id', 'staff_code_sheet', *STAFF_FIELDS)
+        }
+
+    to_create = []
+    to_update = {}
+    changed_fields = set()
+    unchanged = 0
+
+    for values in records:
+        code = values.get('staff_code_sheet')
+        staff = existing.get(code) if code else None
+        if staff is None:
+            staff = Staff(**values)
+            to_create.append(staff)
+            if code and match_existing:
+                # Later rows with the same code update this pending object
+                existing[code] = staff
+            continue
+
+        changed = [
+            field for field in STAFF_FIELDS
+            if field in values and getattr(staff, field) != values[field]
+        ]
+        if not changed:
+            unchanged += 1
+            continue
+        for field in changed:
+            setattr(staff, field, values[field])
+        changed_fields.update(changed)
+        if staff._state.adding:
+            # Still pending creation, bulk_create will pick up the new values
+            continue
+        to_update[staff.pk] = staff
+
+    with transaction.atomic():
+        if to_create:
+            Staff.objects.bulk_create(to_create, batch_size=batch_size)
+        if to_update:
+            Staff.objects.bulk_update(list(to_update.values()), sorted(changed_fields), batch_size=batch_size)
+
+    # bulk_* send no model signals
+    staff_bulk_changed.send(sender=Staff)
+    return to_create, len(to_update), unchanged
+
+
+def attach_qr_codes(staff_list, batch_size=500, workers=None):
+    """
+    Generate QR images for staff without one (in parallel, see
+    generate_qr_batch) and point qr_code_image at the generated file
+    (no second copy through the storage backend).
+    Returns the number of staff updated; always 0 when QR_STORE_FILES is
+    off, since QR images are then rendered on request.
+    """
+    if not store_qr_files():
+        return 0
+    media_root = str(settings.MEDIA_ROOT)
+    pending = [s for s in staff_list if not s.qr_code_image]
+    qr_paths = generate_qr_batch({s.staff_code: staff_payload(s) for s in pending}, workers=workers)
+    for staff in pending:
+        qr_path = qr_paths[staff.staff_code]
+        staff.qr_code_image.name = os.path.relpath(qr_path, media_root).replace(os.sep, '/')
+
+    if pending:
+        with transaction.atomic():
+            Staff.objects.bulk_update(pending, ['qr_code_image'], batch_size=batch_size)
+        staff_bulk_changed.send(sender=Staff)
+    return len(pending)
@@ -0,0 +1,338 @@
+# entrance/live.py
+"""
+Live counters for the dashboard and booth_files pages, streamed as
+Server-Sent Events from /live/.
+
+Each worker process keeps ONE snapshot:
+
+    {'counts': {total_count, printed_count, not_printed_count, sold_count,
+                not_sold_count, passes_today},
+     'booths': [{location, booth, staff_count, printed_count, sold_count,
+                 photo_count}, ...]}
+
+built by a single refresher thread, however many browsers are connected.
+Staff/Pass signals record which staff rows changed and wake the refresher
+once the transaction commits. It waits LIVE_COALESCE_SECONDS so a burst
+of saves becomes one refresh, rebuilds the snapshot (three aggregate
+queries plus one lookup for the changed rows) and publishes the
+difference as a numbered event. Streams only read events from memory;
+a reconnecting browser sends Last-Event-ID and gets the events it missed,
+or a fresh snapshot once they have left the LIVE_HISTORY window.
+
+Other worker processes do not see our signals, so while anyone is
+listening the snapshot is also rebuilt every LIVE_POLL_SECONDS. Counter
+changes found that way arrive without rows ('stale_rows': true).
+"""
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from .models import Pass, Staff
+
+
+logger = logging.getLogger(__name__)
+
+_cond = threading.Condition()
+_refresh_lock = threading.Lock()
+_wakeup = threading.Event()
+_state = {'version': 0, 'snapshot': None}
+_events = deque()
+_dirty_ids = set()
+_all_dirty = False
+_listeners = 0
+_async_waiters = set()
+_refresher = None
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def build_snapshot():
+    counts = Staff.objects.aggregate(
+        total_count=Count('id'),
+        printed_count=Count('id', filter=Q(printed=True)),
+        not_printed_count=Count('id', filter=Q(printed=False)),
+        sold_count=Count('id', filter=Q(sold=True)),
+        not_sold_count=Count('id', filter=Q(sold=False)),
+    )
+    counts['passes_today'] = Pass.objects.filter(day_entered=timezone.localdate()).count()
+
+    # Same GROUP BY as entrance.booths, flattened
+    from .booths import build_tree
+    booths = [
+        {'location': location['code'], 'booth': booth['name'], **{
+            key: booth[key] for key in ('staff_count', 'printed_count', 'sold_count', 'photo_count')
+        }}
+        for location in build_tree()
+        for booth in location['booths']
+    ]
+    return {'counts': counts, 'booths': booths}
+
+
+def _row(staff):
+    return {
+        'id': str(staff.id),
+        'name': staff.name,
+        'phone_number': staff.phone_number,
+        'booth_id': staff.booth_id,
+        'location': staff.location,
+        'location_display': staff.get_location_display(),
+        'staff_type': staff.staff_type,
+        'printed': staff.printed,
+        'sold': staff.sold,
+        'photo_url': staff.photo.url if staff.photo else None,
+    }
+
+
+def _diff(previous, snapshot):
+    counts = {
+        key: value for key, value in snapshot['counts'].items()
+        if previous['counts'].get(key) != value
+    }
+    before = {(b['location'], b['booth']): b for b in previous['booths']}
+    after = {(b['location'], b['booth']): b for b in snapshot['booths']}
+    booths = [b for key, b in after.items() if before.get(key) != b]
+    booths += [
+        {'location': location, 'booth': booth, 'removed': True}
+        for location, booth in before.keys() - after.keys()
+    ]
+    return counts, booths
+
+
+def _publish(payload):
+    """
+    Append an event and wake every stream. Caller holds _cond.
+    """
+    _state['version'] += 1
+    _events.append((_state['version'], payload))
+    while len(_events) > _setting('LIVE_HISTORY', 256):
+        _events.popleft()
+    _cond.notify_all()
+    for loop, event in list(_async_waiters):
+        loop.call_soon_threadsafe(event.set)
+
+
+def refresh():
+    """
+    Rebuild the snapshot and publish what changed. Only one refresh runs
+    at a time; concurrent callers wait for it and reuse its result.
+    """
+    global _all_dirty
+    with _refresh_lock:
+        with _cond:
+            ids, everything = set(_dirty_ids), _all_dirty
+            _dirty_ids.clear()
+            _all_dirty = False
+
+        snapshot = build_snapshot()
+        rows, deleted = [], []
+        if ids and not everything:
+            found = {str(s.id): s for s in Staff.objects.filter(id__in=ids)}
+            rows = [_row(found[i]) for i in sorted(found)]
+            deleted = sorted(ids - found.keys())
+
+        with _cond:
+            previous = _state['snapshot']
+            _state['snapshot'] = snapshot
+            if previous is None:
+                return
+            counts, booths = _diff(previous, snapshot)
+            if counts or booths or rows or deleted or everything:
+                _publish({
+                    'counts': counts,
+                    'booths': booths,
+                    'rows': rows,
+                    'deleted': deleted,
+                    # Counters moved without rows we know of (bulk change, other worker)
+                    'stale_rows': everything or bool(counts and not ids),
+                })
+
+
+def _mark(ids):
+    global _all_dirty
+    with _cond:
+        if ids is None or len(_dirty_ids) + len(ids) > _setting('LIVE_MAX_ROWS', 200):
+            _all_dirty = True
+            _dirty_ids.clear()
+        elif not _all_dirty:
+            _dirty_ids.update(str(i) for i in ids)
+    _wakeup.set()
+
+
+def mark_changed(ids=None):
+    """
+    Note that these staff rows (None: unknown rows) changed. Picked up by
+    the refresher after the current transaction commits; free when no
+    stream is open.
+    """
+    if _refresher is None or not _listeners:
+        return
+    transaction.on_commit(lambda: _mark(ids))
+
+
+def _run():
+    while True:
+        woken = _wakeup.wait(_setting('LIVE_POLL_SECONDS', 5))
+        if woken:
+            # Let a burst of saves land before querying
+            time.sleep(_setting('LIVE_COALESCE_SECONDS', 0.5))
+        _wakeup.clear()
+        with _cond:
+            if not _listeners:
+                # Nobody watching, so changes go untracked: drop the snapshot
+                # and history so a resuming browser starts from a new snapshot
+                if _state['snapshot'] is not None:
+                    _state['snapshot'] = None
+                    _state['version'] += 1
+                    _events.clear()
+                continue
+        close_old_connections()
+        try:
+            refresh()
+        except Exception:
+            # Keep the thread alive through DB hiccups; the next poll retries
+            logger.exception('Live counter refresh failed')
+        finally:
+            close_old_connections()
+
+
+def _subscribe():
+    global _listeners, _refresher
+    with _cond:
+        _listeners += 1
+        if _refresher is None:
+            _refresher = threading.Thread(target=_run, name='live-refresher', daemon=True)
+            _refresher.start()
+
+
+def _unsubscribe():
+    global _listeners
+    with _cond:
+        _listeners -= 1
+
+
+def current():
+    """
+    (version, snapshot), building the snapshot if there is none yet.
+    """
+    with _cond:
+        snapshot = _state['snapshot']
+        if snapshot is not None:
+            return _state['version'], snapshot
+    refresh()
+    with _cond:
+        return _state['version'], _state['snapshot']
+
+
+def _since(version):
+    """
+    Events after version, or None if some of them were already dropped.
+    Caller holds _cond.
+    """
+    if version >= _state['version']:
+        return []
+    if not _events or _events[0][0] > version + 1:
+        return None
+    return [(v, payload) for v, payload in _events if v > version]
+
+
+def _parse_last_id(last_id):
+    try:
+        return int(last_id)
+    except (TypeError, ValueError):
+        return None
+
+
+def format_event(name, version, data):
+    return f'event: {name}\nid: {version}\ndata: {json.dumps(data, separators=(",", ":"))}\n\n'.encode('utf-8')
+
+
+def _opening(last_id):
+    """
+    First chunk of a stream: missed events when resuming, else a snapshot.
+    Returns (bytes, version).
+    """
+    resume = _parse_last_id(last_id)
+    if resume is not None:
+        with _cond:
+            missed = _since(resume)
+        if missed is not None:
+            body = b''.join(format_event('delta', v, payload) for v, payload in missed)
+            return body, missed[-1][0] if missed else resume
+    version, snapshot = current()
+    return format_event('snapshot', version, snapshot), version
+
+
+def _next_chunk(version):
+    """
+    (bytes, version) for everything after version; a snapshot when this
+    stream fell further behind than LIVE_HISTORY. Caller holds _cond.
+    """
+    missed = _since(version)
+    if missed is None:
+        return format_event('snapshot', _state['version'], _state['snapshot']), _state['version']
+    return b''.join(format_event('delta', v, payload) for v, payload in missed), missed[-1][0]
+
+
+def stream(last_id=None):
+    """
+    Sync SSE iterator (WSGI); holds one thread per open stream.
+    """
+    heartbeat = _setting('LIVE_HEARTBEAT_SECONDS', 15)
+    _subscribe()
+    try:
+        yield f'retry: {_setting("LIVE_RETRY_MS", 5000)}\n\n'.encode('ascii')
+        chunk, version = _opening(last_id)
+        yield chunk
+        while True:
+            with _cond:
+                if not _cond.wait_for(lambda: _state['version'] > version, timeout=heartbeat):
+                    chunk = b': ping\n\n'
+                else:
+                    chunk, version = _next_chunk(version)
+            yield chunk
+    finally:
+        _unsubscribe()
+
+
+async def astream(last_id=None):
+    """
+    Async SSE iterator (ASGI); an open stream costs no thread.
+    """
+    from asgiref.sync import sync_to_async
+
+    heartbeat = _setting('LIVE_HEARTBEAT_SECONDS', 15)
+    event = asyncio.Event()
+    waiter = (asyncio.get_running_loop(), event)
+    _subscribe()
+    with _cond:
+        _async_waiters.add(waiter)
+    try:
+        yield f'retry: {_setting("LIVE_RETRY_MS", 5000)}\n\n'.encode('ascii')
+        chunk, version = await sync_to_async(_opening)(last_id)
+        yield chunk
+        while True:
+            try:
+                await asyncio.wait_for(event.wait(), heartbeat)
+            except asyncio.TimeoutError:
+                pass
+            event.clear()
+            with _cond:
+                if _state['version'] > version:
+                    chunk, version = _next_chunk(version)
+                else:
+                    chunk = b': ping\n\n'
+            yield chunk
+    finally:
+        with _cond:
+            _async_waiters.discard(waiter)
+        _unsubscribe()
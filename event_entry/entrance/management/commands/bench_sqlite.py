@@ -0,0 +1,175 @@
+# entrance/management/commands/bench_sqlite.py
+
+import random
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from entrance import dbtune
+
+
+# What SQLite does without SQLITE_TUNED_PRAGMAS (Django's default 5s timeout)
+DEFAULT_PROFILE = {'journal_mode': 'DELETE', 'synchronous': 'FULL', 'busy_timeout': 5000}
+
+
+def _percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark gate-scan style reads while an import-style writer is running, "
+        "with SQLite defaults vs SQLITE_TUNED_PRAGMAS. Runs on a temporary copy of the database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--seconds',
+            type=float,
+            default=5,
+            help='Duration of each run (default: 5).',
+        )
+        parser.add_argument(
+            '--readers',
+            type=int,
+            default=8,
+            help='Concurrent reader threads, one connection each (default: 8).',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Rows updated per statement by the writer (default: 500).',
+        )
+        parser.add_argument(
+            '--no-writer',
+            action='store_true',
+            help='Measure reads alone, without the concurrent writer.',
+        )
+
+    def handle(self, *args, **options):
+        db = connections['default']
+        if db.vendor != 'sqlite':
+            raise CommandError('bench_sqlite only applies to the SQLite backend.')
+
+        with tempfile.TemporaryDirectory() as tmp:
+            # Consistent snapshot via the backup API (safe while the app is running)
+            snapshot = Path(tmp) / 'snapshot.sqlite3'
+            source = sqlite3.connect(str(db.settings_dict['NAME']))
+            target = sqlite3.connect(str(snapshot))
+            source.backup(target)
+            source.close()
+            target.execute('PRAGMA journal_mode=DELETE')
+            target.close()
+
+            ids = [row[0] for row in sqlite3.connect(str(snapshot)).execute('SELECT id FROM entrance_staff')]
+            if not ids:
+                raise CommandError('No staff rows to benchmark with; import staff first.')
+
+            profiles = [
+                ('default', DEFAULT_PROFILE),
+                ('tuned', getattr(settings, 'SQLITE_TUNED_PRAGMAS', {})),
+            ]
+            for name, pragmas in profiles:
+                path = Path(tmp) / f'{name}.sqlite3'
+                shutil.copyfile(snapshot, path)
+                result = self.run_profile(path, pragmas, ids, options)
+                self.stdout.write(
+                    self.style.SUCCESS(
+                        f"{name:>7}: {result['reads_per_s']:,.0f} reads/s | "
+                        f"p50 {result['p50_ms']:.2f} ms, p95 {result['p95_ms']:.2f} ms, "
+                        f"max {result['max_ms']:.1f} ms | locked errors: {result['errors']} | "
+                        f"writer: {result['rows_written']:,} rows in {result['commits']} commits"
+                    )
+                )
+
+    def run_profile(self, path, pragmas, ids, options):
+        stop = threading.Event()
+        latencies = []
+        lock = threading.Lock()
+        counters = {'errors': 0, 'rows_written': 0, 'commits': 0}
+
+        def connect():
+            conn = sqlite3.connect(str(path), timeout=pragmas.get('busy_timeout', 5000) / 1000,
+                                   isolation_level=None, check_same_thread=False)
+            dbtune.apply(conn.cursor(), pragmas)
+            return conn
+
+        def reader():
+            conn = connect()
+            local = []
+            errors = 0
+            rng = random.Random()
+            while not stop.is_set():
+                staff_id = rng.choice(ids)
+                started = time.perf_counter()
+                try:
+                    # Same shape as the verify_staff lookup
+                    conn.execute(
+                        'SELECT id, name, phone_number, booth_id, location, staff_type, qr_code_image '
+                        'FROM entrance_staff WHERE id = ?',
+                        (staff_id,),
+                    ).fetchone()
+                except sqlite3.OperationalError:
+                    errors += 1
+                    continue
+                local.append(time.perf_counter() - started)
+            conn.close()
+            with lock:
+                latencies.extend(local)
+                counters['errors'] += errors
+
+        def writer():
+            # Like upsert_staff: one transaction per pass over the roster
+            conn = connect()
+            batch_size = options['batch_size']
+            while not stop.is_set():
+                try:
+                    conn.execute('BEGIN IMMEDIATE')
+                    for i in range(0, len(ids), batch_size):
+                        chunk = ids[i:i + batch_size]
+                        conn.execute(
+                            f"UPDATE entrance_staff SET sold = NOT sold "
+                            f"WHERE id IN ({','.join('?' * len(chunk))})",
+                            chunk,
+                        )
+                        counters['rows_written'] += len(chunk)
+                    conn.execute('COMMIT')
+                    counters['commits'] += 1
+                except sqlite3.OperationalError:
+                    if conn.in_transaction:
+                        conn.execute('ROLLBACK')
+                    with lock:
+                        counters['errors'] += 1
+            conn.close()
+
+        threads = [threading.Thread(target=reader) for _ in range(options['readers'])]
+        if not options['no_writer']:
+            threads.append(threading.Thread(target=writer))
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        time.sleep(options['seconds'])
+        stop.set()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        latencies.sort()
+        return {
+            'reads_per_s': len(latencies) / elapsed,
+            'p50_ms': _percentile(latencies, 0.50) * 1000,
+            'p95_ms': _percentile(latencies, 0.95) * 1000,
+            'max_ms': (latencies[-1] if latencies else 0) * 1000,
+            **counters,
+        }
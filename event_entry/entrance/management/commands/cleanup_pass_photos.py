@@ -1,35 +1,125 @@
 # entrance/management/commands/cleanup_pass_photos.py
 
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.storage import default_storage
 from django.core.management.base import BaseCommand
+from django.db import close_old_connections
 from django.utils import timezone
-from datetime import timedelta
 from entrance.models import Pass
 
 
 class Command(BaseCommand):
-    help = 'Delete pass photos older than 12 hours (run via cron or scheduled task)'
+    help = (
+        'Delete pass photos older than PASS_PHOTO_TTL_HOURS (default 12). '
+        'Run via cron/scheduled task, or keep it running with --loop.'
+    )
 
-    def handle(self, *args, **options):
-        cutoff_time = timezone.now() - timedelta(hours=12)
-        
-        # Find passes with photos older than 12 hours
-        old_passes = Pass.objects.filter(
-            photo_taken_at__lt=cutoff_time,
-            photo__isnull=False
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--ttl-hours',
+            type=float,
+            default=None,
+            help='Photo lifetime in hours (default: PASS_PHOTO_TTL_HOURS setting or 12).',
         )
-        
-        deleted_count = 0
-        for pass_obj in old_passes:
-            if pass_obj.photo:
-                pass_obj.photo.delete()
-                pass_obj.photo = None
-                pass_obj.photo_taken_at = None
-                pass_obj.save()
-                deleted_count += 1
-        
-        self.stdout.write(
-            self.style.SUCCESS(
-                f'Deleted {deleted_count} pass photos older than 12 hours.'
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Photos deleted per batch (default: 500).',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=8,
+            help='Threads used to delete photo files (default: 8).',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report what would be deleted.',
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep running and sweep every --interval seconds.',
+        )
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=300,
+            help='Seconds between sweeps in --loop mode (default: 300).',
+        )
+
+    def handle(self, *args, **options):
+        ttl_hours = options['ttl_hours']
+        if ttl_hours is None:
+            ttl_hours = getattr(settings, 'PASS_PHOTO_TTL_HOURS', 12)
+
+        while True:
+            deleted_count = self.sweep(
+                ttl_hours,
+                options['batch_size'],
+                options['workers'],
+                options['dry_run'],
+            )
+            verb = 'Would delete' if options['dry_run'] else 'Deleted'
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f'{verb} {deleted_count} pass photos older than {ttl_hours:g} hours.'
+                )
             )
+            if not options['loop']:
+                break
+            close_old_connections()
+            time.sleep(options['interval'])
+
+    def sweep(self, ttl_hours, batch_size, workers, dry_run):
+        cutoff_time = timezone.now() - timedelta(hours=ttl_hours)
+
+        # Served by the photo_taken_at index
+        expired = (
+            Pass.objects.filter(photo_taken_at__lt=cutoff_time, photo__isnull=False)
+            .exclude(photo='')
+            .order_by('photo_taken_at')
         )
 
+        if dry_run:
+            return expired.count()
+
+        def delete_file(name):
+            try:
+                default_storage.delete(name)
+            except Exception as exc:
+                self.stderr.write(self.style.WARNING(f'Could not delete {name}: {exc}'))
+                return False
+            return True
+
+        deleted_count = 0
+        failed_ids = set()
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            while True:
+                batch = list(expired.exclude(id__in=failed_ids).values_list('id', 'photo')[:batch_size])
+                if not batch:
+                    break
+
+                # Delete the files first (in parallel), then clear only the rows
+                # whose file is gone; a failed delete keeps its row for the next
+                # sweep. Verify pages already hide photos past the TTL.
+                results = pool.map(delete_file, [name for _, name in batch])
+                ids = []
+                for (pass_id, _), deleted in zip(batch, results):
+                    if deleted:
+                        ids.append(pass_id)
+                    else:
+                        failed_ids.add(pass_id)
+                Pass.objects.filter(id__in=ids).update(photo=None, photo_taken_at=None)
+                deleted_count += len(ids)
+
+                if len(batch) < batch_size:
+                    break
+
+        return deleted_count
@@ -1,71 +1,224 @@
+import hashlib
+import json
 import os
+import shutil
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 from django.core.management.base import BaseCommand
 from django.conf import settings
 
 from entrance.models import Staff
-from entrance.utils import generate_qr
+from entrance.utils import generate_qr_batch
+from entrance.qrsign import staff_payload
+
+
+MANIFEST_NAME = ".export_manifest.json"
+MANIFEST_VERSION = 1
+
+
+def _source_signature(path):
+    """
+    Cheap change detector for a source QR file: generate_qr replaces files
+    atomically, so a regenerated image always has a new inode/mtime.
+    """
+    st = os.stat(path)
+    return [st.st_ino, st.st_size, st.st_mtime_ns]
+
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 16), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _place_file(src, dst):
+    """
+    Hardlink src to dst; fall back to a kernel-side copy (shutil.copyfile
+    uses copy_file_range/sendfile, which reflinks on CoW filesystems).
+    Returns "link" or "copy".
+    """
+    tmp = dst.with_name(f".tmp_{dst.name}")
+    if tmp.exists():
+        tmp.unlink()
+    try:
+        os.link(src, tmp)
+        method = "link"
+    except OSError:
+        shutil.copyfile(src, tmp)
+        method = "copy"
+    os.replace(tmp, dst)
+    return method
+
+
+def _staff_list_text(location, booth_id, staff_in_booth):
+    lines = [
+        f"Location: {location}\n",
+        f"Booth ID: {booth_id}\n",
+        f"Total staff: {len(staff_in_booth)}\n",
+        "\n",
+        "staff_code,name,phone_number,staff_type\n",
+    ]
+    for s in staff_in_booth:
+        lines.append(f"{s.staff_code},{s.name},{s.phone_number},{s.staff_type}\n")
+    return "".join(lines)
 
 
 class Command(BaseCommand):
-    help = "Export staff QR codes into local folders grouped by location/booth, with a staff list per booth."
+    help = (
+        "Export staff QR codes into local folders grouped by location/booth, with a staff list per booth. "
+        "Only booths whose roster or QR images changed since the last run are rewritten."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=None,
+            help="Processes used to render missing QR codes and threads used to export booths (default: all cores).",
+        )
+        parser.add_argument(
+            "--prune",
+            action="store_true",
+            help="Remove exported QR files and booth folders for staff that no longer exist.",
+        )
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Ignore the manifest and rewrite every booth.",
+        )
 
     def handle(self, *args, **options):
         # Use default root from settings so UI can read it
         export_root = Path(getattr(settings, "BOOTH_QR_EXPORT_ROOT", settings.BASE_DIR / "booth_qr_export")).resolve()
         export_root.mkdir(parents=True, exist_ok=True)
-
-        total_qr = 0
-        booths_seen = set()
+        manifest_path = export_root / MANIFEST_NAME
+        workers = options["workers"] or os.cpu_count() or 1
+
+        manifest = {"version": MANIFEST_VERSION, "booths": {}}
+        if manifest_path.exists() and not options["force"]:
+            try:
+                loaded = json.loads(manifest_path.read_text(encoding="utf-8"))
+                if loaded.get("version") == MANIFEST_VERSION:
+                    manifest = loaded
+            except ValueError:
+                self.stderr.write(self.style.WARNING("Ignoring unreadable export manifest."))
+        old_booths = manifest["booths"]
 
         # Order for nice grouping
-        queryset = Staff.objects.all().order_by("location", "booth_id", "name")
+        staff_rows = list(Staff.objects.all().order_by("location", "booth_id", "name"))
+
+        # Ensure QR exists in media using staff_code (UUID-based), rendered in parallel
+        qr_paths = generate_qr_batch(
+            {s.staff_code: staff_payload(s) for s in staff_rows}, workers=options["workers"]
+        )
 
-        for staff in queryset:
+        booths = defaultdict(list)
+        for staff in staff_rows:
             location = staff.location or "unknown_location"
             booth_id = staff.booth_id or "no_booth"
+            booths[(location, booth_id)].append(staff)
 
+        def export_booth(key):
+            location, booth_id = key
+            staff_in_booth = booths[key]
             # Folder structure: root/location/booth_id/
             booth_dir = export_root / location / booth_id
             booth_dir.mkdir(parents=True, exist_ok=True)
-
-            # Ensure QR exists in media using staff_code (UUID-based)
-            qr_path = generate_qr(staff.staff_code)
-
-            # Copy QR into this folder with a stable filename
-            qr_filename = f"{staff.staff_code}.png"
-            target_file = booth_dir / qr_filename
-
-            with open(qr_path, "rb") as src, open(target_file, "wb") as dst:
-                dst.write(src.read())
-
-            total_qr += 1
-
-            # Track booths we have processed so we can build a per‑booth staff list
-            booths_seen.add((location, booth_id))
-
-        # For each booth, write a staff_list.txt with basic info
-        for (location, booth_id) in booths_seen:
-            booth_dir = export_root / location / booth_id
-            staff_in_booth = queryset.filter(location=location, booth_id=booth_id)
-
+            booth_key = f"{location}/{booth_id}"
+            previous = old_booths.get(booth_key, {})
+            previous_files = previous.get("files", {})
+            counts = {"link": 0, "copy": 0, "skipped": 0, "pruned": 0}
+
+            files = {}
+            for staff in staff_in_booth:
+                qr_filename = f"{staff.staff_code}.png"
+                src = qr_paths[staff.staff_code]
+                target_file = booth_dir / qr_filename
+                signature = _source_signature(src)
+                entry = previous_files.get(qr_filename)
+                if entry and entry["source"] == signature and target_file.exists():
+                    files[qr_filename] = entry
+                    counts["skipped"] += 1
+                    continue
+                counts[_place_file(src, target_file)] += 1
+                files[qr_filename] = {"source": signature, "sha256": _file_sha256(target_file)}
+
+            staff_list = _staff_list_text(location, booth_id, staff_in_booth)
+            roster_hash = hashlib.sha256(staff_list.encode("utf-8")).hexdigest()
             list_path = booth_dir / "staff_list.txt"
-            with open(list_path, "w", encoding="utf-8") as f:
-                f.write(f"Location: {location}\n")
-                f.write(f"Booth ID: {booth_id}\n")
-                f.write(f"Total staff: {staff_in_booth.count()}\n")
-                f.write("\n")
-                f.write("staff_code,name,phone_number,staff_type\n")
-                for s in staff_in_booth:
-                    line = f"{s.staff_code},{s.name},{s.phone_number},{s.staff_type}\n"
-                    f.write(line)
+            if previous.get("roster") != roster_hash or not list_path.exists():
+                list_path.write_text(staff_list, encoding="utf-8")
+                changed = True
+            else:
+                changed = counts["link"] + counts["copy"] > 0
+
+            # Files of staff no longer in this booth keep their manifest entry
+            # until they are deleted, so a later --prune can still find them
+            for stale in set(previous_files) - set(files):
+                stale_path = booth_dir / stale
+                if not stale_path.exists():
+                    continue
+                if options["prune"]:
+                    try:
+                        stale_path.unlink()
+                    except OSError as exc:
+                        self.stderr.write(self.style.WARNING(f"Could not remove {stale_path}: {exc}"))
+                    else:
+                        counts["pruned"] += 1
+                        continue
+                files[stale] = previous_files[stale]
+
+            return booth_key, {"roster": roster_hash, "files": files}, counts, changed
+
+        totals = {"link": 0, "copy": 0, "skipped": 0, "pruned": 0}
+        changed_booths = 0
+        new_booths = {}
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for booth_key, entry, counts, changed in pool.map(export_booth, sorted(booths)):
+                new_booths[booth_key] = entry
+                for name, value in counts.items():
+                    totals[name] += value
+                changed_booths += int(changed)
+
+        # Booths that no longer have any staff
+        removed_booths = set(old_booths) - set(new_booths)
+        if options["prune"]:
+            for booth_key in removed_booths:
+                booth_dir = export_root / booth_key
+                if booth_dir.is_dir():
+                    for name in old_booths[booth_key].get("files", {}):
+                        (booth_dir / name).unlink(missing_ok=True)
+                        totals["pruned"] += 1
+                    (booth_dir / "staff_list.txt").unlink(missing_ok=True)
+                    try:
+                        booth_dir.rmdir()
+                    except OSError:
+                        # Folder still has files we did not create; leave it
+                        pass
+        else:
+            # Keep tracking them so a later --prune can still clean up
+            for booth_key in removed_booths:
+                new_booths[booth_key] = old_booths[booth_key]
+
+        manifest = {"version": MANIFEST_VERSION, "booths": new_booths}
+        tmp_manifest = manifest_path.with_name(f".tmp_{MANIFEST_NAME}")
+        tmp_manifest.write_text(json.dumps(manifest, indent=1, sort_keys=True), encoding="utf-8")
+        os.replace(tmp_manifest, manifest_path)
 
         self.stdout.write(
             self.style.SUCCESS(
-                f"Done. Exported {total_qr} QR codes into {export_root} "
+                f"Done. Exported {len(staff_rows)} QR codes into {export_root} "
                 f"with staff_list.txt per booth."
             )
         )
-
-
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Booths changed: {changed_booths}/{len(booths)} | "
+                f"linked: {totals['link']}, copied: {totals['copy']}, "
+                f"unchanged: {totals['skipped']}, pruned: {totals['pruned']}"
+            )
+        )
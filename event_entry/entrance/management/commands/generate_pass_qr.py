@@ -1,37 +1,78 @@
-from django.core.management.base import BaseCommand
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Exists, OuterRef
 from django.utils import timezone
 from entrance.models import Staff, Pass
 
+
 class Command(BaseCommand):
-    help = "Automatically generate Pass records from Staff members using staff QR"
+    help = (
+        "Generate Pass records for every staff member that has no pass for the day yet. "
+        "No QR files are written: the pass page and the admin render the pass payload "
+        "through /qr/<payload>.png."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--day",
+            default=None,
+            help="Day to generate passes for, as YYYY-MM-DD (default: today).",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Rows per bulk INSERT (default: 500).",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report how many passes would be created.",
+        )
 
     def handle(self, *args, **options):
-        today = timezone.now().date()
-        created_count = 0
-
-        for staff in Staff.objects.all():
-            # Skip if Pass already exists for today
-            if Pass.objects.filter(staff=staff, day_entered=today).exists():
-                continue
-
-            pass_obj = Pass.objects.create(
-                full_name=staff.name or "Staff Member",
-                phone_number=staff.phone_number or "",
-                booth_id=staff.booth_id or "N/A",
-                staff=staff,
-                day_entered=today,
+        if options["day"]:
+            try:
+                day = date.fromisoformat(options["day"])
+            except ValueError:
+                raise CommandError(f"Invalid --day {options['day']!r}, expected YYYY-MM-DD")
+        else:
+            day = timezone.localdate()
+
+        # One anti-join: staff with no pass for that day
+        missing = (
+            Staff.objects.filter(
+                ~Exists(Pass.objects.filter(staff=OuterRef("pk"), day_entered=day))
             )
+            .values_list("id", "name", "phone_number", "booth_id")
+        )
 
-            # Copy staff QR code to pass
-            if staff.qr_code_image:
-                pass_obj.qr_code_image.save(
-                    staff.qr_code_image.name.split('/')[-1],  # keep the filename
-                    staff.qr_code_image.file,
-                    save=True
-                )
+        if options["dry_run"]:
+            self.stdout.write(self.style.SUCCESS(f"{missing.count()} passes would be generated for {day}"))
+            return
 
-            created_count += 1
+        # No row locking here: SQLite ignores select_for_update(). Two runs for
+        # the same day at the same time can both create passes for a staff member.
+        with transaction.atomic():
+            passes = [
+                Pass(
+                    full_name=name or "Staff Member",
+                    phone_number=phone_number or "",
+                    booth_id=booth_id or "N/A",
+                    staff_id=staff_id,
+                    day_entered=day,
+                )
+                for staff_id, name, phone_number, booth_id in missing
+            ]
+            # qr_code_image stays empty: the QR is a function of the pass
+            # payload, so nothing is rendered or copied per pass each day.
+            # bulk_create sends no post_save; that only matters for live
+            # streams, and the server workers (a separate process from this
+            # command) pick the new passes up on their next LIVE_POLL_SECONDS poll.
+            Pass.objects.bulk_create(passes, batch_size=options["batch_size"])
 
         self.stdout.write(
-            self.style.SUCCESS(f"✅ {created_count} passes generated successfully")
+            self.style.SUCCESS(f"✅ {len(passes)} passes generated successfully for {day}")
         )
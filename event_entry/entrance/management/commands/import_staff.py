@@ -2,11 +2,9 @@
 
 import csv
 import os
-from pathlib import Path
+import time
 from django.core.management.base import BaseCommand
-from django.core.files import File
-from entrance.models import Staff
-from entrance.utils import generate_qr
+from entrance.ingest import normalize_row, upsert_staff, attach_qr_codes
 
 
 class Command(BaseCommand):
@@ -14,9 +12,22 @@ class Command(BaseCommand):
 
     def add_arguments(self, parser):
         parser.add_argument('csv_file', type=str, help='Path to the CSV file to import.')
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Rows per bulk INSERT/UPDATE statement (default: 500).',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=None,
+            help='Processes used to render QR codes (default: all cores).',
+        )
 
     def handle(self, *args, **options):
         csv_file_path = options['csv_file']
+        batch_size = options['batch_size']
 
         # Make absolute path if needed
         if not os.path.isabs(csv_file_path):
@@ -26,7 +37,8 @@ class Command(BaseCommand):
             self.stdout.write(self.style.ERROR(f'CSV file not found: {csv_file_path}'))
             return
 
-        created_count = 0
+        started = time.perf_counter()
+        records = []
         error_count = 0
 
         with open(csv_file_path, 'r', encoding='utf-8') as file:
@@ -34,50 +46,28 @@ class Command(BaseCommand):
 
             for row_num, row in enumerate(reader, start=1):
                 try:
-                    # Extract and sanitize fields
-                    name = row.get('Name', '').strip() or 'Unknown'
-                    booth_id = row.get('Booth ID', '').strip() or None
-                    phone_no = row.get('Phone no', '').strip()
-                    location = row.get('Location', '1p').strip()
-                    staff_type = row.get('Staff Type', 'Staff').strip()
-
-                    # Normalize phone number
-                    phone_no = ''.join(filter(str.isdigit, phone_no)) if phone_no else 'N/A'
-
-                    # Validate location
-                    if location not in dict(Staff.LOCATION_CHOICES):
-                        location = '1p'
-
-                    # Normalize staff_type
-                    staff_type = staff_type.upper()
-                    if staff_type != 'VIP':
-                        staff_type = 'Staff'
-
-                    # ✅ CREATE a new staff record
-                    staff = Staff.objects.create(
-                        name=name,
-                        booth_id=booth_id,
-                        phone_number=phone_no,
-                        location=location,
-                        staff_type=staff_type
-                    )
-                    created_count += 1
-                    self.stdout.write(self.style.SUCCESS(f'Row {row_num}: Created {staff.name} ({staff_type})'))
-
-                    # ✅ Generate QR code using staff_code (what scanner expects)
-                    qr_path = generate_qr(staff.staff_code)
-                    with open(qr_path, 'rb') as f:
-                        staff.qr_code_image.save(
-                            f'staff_{staff.staff_code}.png',
-                            File(f),
-                            save=True
-                        )
-
+                    records.append(normalize_row(row))
                 except Exception as e:
                     error_count += 1
                     self.stdout.write(self.style.ERROR(f'Row {row_num} error: {str(e)}'))
 
+        # ✅ One transaction for all rows; rows with a known Staff Code update in place
+        created, updated_count, unchanged_count = upsert_staff(records, batch_size=batch_size)
+        if options['verbosity'] > 1:
+            for staff in created:
+                self.stdout.write(self.style.SUCCESS(f'Created {staff.name} ({staff.staff_type})'))
+
+        # ✅ Generate QR codes using staff_code (what scanner expects) after the DB writes
+        qr_count = attach_qr_codes(created, batch_size=batch_size, workers=options['workers'])
+
+        elapsed = time.perf_counter() - started
+        rate = len(records) / elapsed if elapsed else 0
+
         # Summary
-        self.stdout.write(self.style.SUCCESS('\n==== IMPORT SUMMARY ===='))        
-        self.stdout.write(self.style.SUCCESS(f'Total created: {created_count}'))
+        self.stdout.write(self.style.SUCCESS('\n==== IMPORT SUMMARY ===='))
+        self.stdout.write(self.style.SUCCESS(f'Total created: {len(created)}'))
+        self.stdout.write(self.style.SUCCESS(f'Total updated: {updated_count}'))
+        self.stdout.write(self.style.SUCCESS(f'Unchanged: {unchanged_count}'))
+        self.stdout.write(self.style.SUCCESS(f'QR codes generated: {qr_count}'))
         self.stdout.write(self.style.ERROR(f'Total errors: {error_count}'))
+        self.stdout.write(self.style.SUCCESS(f'{len(records)} rows in {elapsed:.2f}s ({rate:.0f} rows/s)'))
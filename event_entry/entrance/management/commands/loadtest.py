@@ -0,0 +1,356 @@
+# entrance/management/commands/loadtest.py
+
+import base64
+import io
+import json
+import random
+import threading
+import time
+import uuid
+from collections import defaultdict
+from http.cookiejar import CookieJar
+from pathlib import Path
+from urllib import error as urlerror
+from urllib import parse, request as urlrequest
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.utils import timezone
+
+from entrance.models import Staff, Pass, ScanEvent
+
+
+# Marks everything the harness creates, so --cleanup can remove it again
+SEED_CODE_PREFIX = 'LT'
+LOADTEST_GATE = 'loadtest'
+LOADTEST_USER = 'loadtest'
+
+# Endpoint weights per mix (relative)
+MIXES = {
+    'gate': {'verify_staff': 70, 'verify_pass': 20, 'get_staff_info': 10},
+    'desk': {'get_staff_info': 50, 'create_pass': 50},
+    'admin': {'dashboard': 100},
+    'full': {'verify_staff': 55, 'verify_pass': 20, 'get_staff_info': 15, 'create_pass': 5, 'dashboard': 5},
+}
+
+
+def _percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def _sample_photo():
+    """
+    A camera-sized JPEG data URL, so create_pass runs the real photo pipeline.
+    """
+    from PIL import Image
+
+    image = Image.linear_gradient('L').resize((1280, 960)).convert('RGB')
+    out = io.BytesIO()
+    image.save(out, format='JPEG', quality=90)
+    return 'data:image/jpeg;base64,' + base64.b64encode(out.getvalue()).decode('ascii')
+
+
+class InProcessClient:
+    """
+    Django test client per thread: full middleware/view/template stack,
+    no network.
+    """
+    def __init__(self, user):
+        from django.test import Client
+
+        self.client = Client(HTTP_HOST=(settings.ALLOWED_HOSTS or ['localhost'])[-1])
+        self.client.force_login(user)
+
+    def get(self, path):
+        return self.client.get(path).status_code
+
+    def post(self, path, data):
+        return self.client.post(path, data).status_code
+
+    def close(self):
+        connections.close_all()
+
+
+class HttpClient:
+    """
+    Plain urllib client against a running server, logged in through /login/.
+    """
+    def __init__(self, base_url, username, password):
+        self.base_url = base_url.rstrip('/')
+        self.cookies = CookieJar()
+        self.opener = urlrequest.build_opener(urlrequest.HTTPCookieProcessor(self.cookies))
+        self.opener.open(self.base_url + '/login/').read()
+        status = self.post('/login/', {'username': username, 'password': password})
+        if status >= 400:
+            raise CommandError(f'Login to {self.base_url} failed with HTTP {status}')
+
+    def _csrf(self):
+        return next((c.value for c in self.cookies if c.name == settings.CSRF_COOKIE_NAME), '')
+
+    def _send(self, req):
+        try:
+            with self.opener.open(req, timeout=30) as response:
+                response.read()
+                return response.status
+        except urlerror.HTTPError as e:
+            return e.code
+        except urlerror.URLError:
+            return 599
+
+    def get(self, path):
+        return self._send(urlrequest.Request(self.base_url + path))
+
+    def post(self, path, data):
+        body = parse.urlencode(data).encode('utf-8')
+        req = urlrequest.Request(self.base_url + path, data=body, headers={
+            'X-CSRFToken': self._csrf(),
+            'Referer': self.base_url + path,
+        })
+        return self._send(req)
+
+    def close(self):
+        pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-test the gate and dashboard endpoints: seed a synthetic roster, drive "
+        "verify_staff / verify_pass / get_staff_info / create_pass / dashboard concurrently "
+        "(in process, or against --url), and report p50/p95/p99 latency and throughput as JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=0,
+                            help='Create this many synthetic staff (with passes for today) before running.')
+        parser.add_argument('--cleanup', action='store_true',
+                            help='Delete the synthetic roster, its passes/files and loadtest scan events, then exit.')
+        parser.add_argument('--mix', choices=sorted(MIXES), default='full',
+                            help='Request mix (default: full).')
+        parser.add_argument('--concurrency', type=int, default=8,
+                            help='Concurrent clients (default: 8).')
+        parser.add_argument('--duration', type=float, default=10,
+                            help='Seconds to run (default: 10).')
+        parser.add_argument('--warmup', type=float, default=1,
+                            help='Seconds of traffic excluded from the results (default: 1).')
+        parser.add_argument('--url', default='',
+                            help='Base URL of a running server (e.g. http://127.0.0.1:8000); default is in-process.')
+        parser.add_argument('--password', default='loadtest',
+                            help="Password for the 'loadtest' user when using --url (default: loadtest).")
+        parser.add_argument('--output', default='',
+                            help='Results file (default: BASE_DIR/loadtest_results/<timestamp>.json).')
+
+    def handle(self, *args, **options):
+        if options['cleanup']:
+            self.cleanup()
+            return
+        if options['seed']:
+            self.seed(options['seed'])
+
+        staff_ids = [str(i) for i in Staff.objects.filter(staff_code_sheet__startswith=SEED_CODE_PREFIX)
+                     .values_list('id', flat=True)]
+        pass_ids = [str(i) for i in Pass.objects.filter(staff_id__in=staff_ids, day_entered=timezone.localdate())
+                    .values_list('id', flat=True)]
+        if not staff_ids:
+            raise CommandError('No synthetic roster found; run with --seed N first.')
+
+        user = self.loadtest_user(options['password'])
+        mix = MIXES[options['mix']]
+        if 'verify_pass' in mix and not pass_ids:
+            raise CommandError('No passes for today on the synthetic roster; re-run with --seed.')
+
+        photo = _sample_photo() if 'create_pass' in mix else ''
+        results = self.drive(options, user, mix, staff_ids, pass_ids, photo)
+        report = {
+            'started_at': timezone.now().isoformat(),
+            'target': options['url'] or 'in-process',
+            'mix': options['mix'],
+            'weights': mix,
+            'concurrency': options['concurrency'],
+            'duration_s': options['duration'],
+            'warmup_s': options['warmup'],
+            'roster_size': len(staff_ids),
+            'settings': {
+                'debug': settings.DEBUG,
+                'scan_log_enabled': getattr(settings, 'SCAN_LOG_ENABLED', True),
+                'qr_signed_payloads': getattr(settings, 'QR_SIGNED_PAYLOADS', False),
+            },
+            **results,
+        }
+
+        output = Path(options['output']) if options['output'] else (
+            Path(settings.BASE_DIR) / 'loadtest_results' / f"{timezone.now():%Y%m%d_%H%M%S}.json"
+        )
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(json.dumps(report, indent=2), encoding='utf-8')
+
+        for name, stats in sorted(results['endpoints'].items()):
+            self.stdout.write(
+                f"{name:<15} {stats['count']:>7} req {stats['rps']:>8.1f}/s  "
+                f"p50 {stats['p50_ms']:>7.1f}  p95 {stats['p95_ms']:>7.1f}  p99 {stats['p99_ms']:>7.1f} ms  "
+                f"errors {stats['errors']}"
+            )
+        total = results['total']
+        self.stdout.write(self.style.SUCCESS(
+            f"Total: {total['count']} requests, {total['rps']:.1f}/s, p95 {total['p95_ms']:.1f} ms, "
+            f"errors {total['errors']}. Results written to {output}"
+        ))
+
+    def loadtest_user(self, password):
+        User = get_user_model()
+        user, created = User.objects.get_or_create(username=LOADTEST_USER)
+        if created or not user.check_password(password):
+            user.set_password(password)
+            user.save()
+        return user
+
+    def seed(self, count):
+        """
+        Synthetic roster through the models: booths of 1 VIP + 3 Staff spread
+        over every location, plus a pass for today per staff.
+        """
+        locations = [code for code, _ in Staff.LOCATION_CHOICES]
+        existing = Staff.objects.filter(staff_code_sheet__startswith=SEED_CODE_PREFIX).count()
+        staff = []
+        for n in range(existing, existing + count):
+            booth = n // 4
+            staff.append(Staff(
+                name=f'Loadtest Staff {n}',
+                phone_number=f'09{n:08d}',
+                booth_id=f'LT{booth}',
+                location=locations[booth % len(locations)],
+                staff_type='VIP' if n % 4 == 0 else 'Staff',
+                staff_code_sheet=f'{SEED_CODE_PREFIX}{n:06d}',
+            ))
+        Staff.objects.bulk_create(staff, batch_size=500)
+
+        today = timezone.localdate()
+        Pass.objects.bulk_create([
+            Pass(staff=s, full_name=s.name, phone_number=s.phone_number, booth_id=s.booth_id, day_entered=today)
+            for s in staff
+        ], batch_size=500)
+
+        from entrance.signals import staff_bulk_changed
+        staff_bulk_changed.send(sender=Staff)
+        self.stdout.write(self.style.SUCCESS(f'Seeded {count} synthetic staff with passes for {today}.'))
+
+    def cleanup(self):
+        seeded = Staff.objects.filter(staff_code_sheet__startswith=SEED_CODE_PREFIX)
+        files = []
+        for pass_id, qr, photo in Pass.objects.filter(staff__in=seeded).values_list('id', 'qr_code_image', 'photo'):
+            # With QR_STORE_FILES on, qr points at generate_qr's staff_qr/ file
+            files += [name for name in (qr, photo) if name]
+        for name in files:
+            default_storage.delete(name)
+
+        _, deleted = seeded.delete()
+        scans = ScanEvent.objects.filter(gate=LOADTEST_GATE).delete()[0]
+        get_user_model().objects.filter(username=LOADTEST_USER).delete()
+
+        from entrance.signals import staff_bulk_changed
+        staff_bulk_changed.send(sender=Staff)
+        self.stdout.write(self.style.SUCCESS(
+            f"Removed {deleted.get(Staff._meta.label, 0)} staff, {deleted.get(Pass._meta.label, 0)} passes, "
+            f"{len(files)} files and {scans} scan events."
+        ))
+
+    def drive(self, options, user, mix, staff_ids, pass_ids, photo):
+        names = list(mix)
+        weights = [mix[name] for name in names]
+        gate = f'?gate={LOADTEST_GATE}'
+
+        def make_request(client, name, rng):
+            if name == 'verify_staff':
+                return client.get(f'/verify/{rng.choice(staff_ids)}/{gate}')
+            if name == 'verify_pass':
+                return client.get(f'/verify-pass/{rng.choice(pass_ids)}/{gate}')
+            if name == 'get_staff_info':
+                return client.get(f'/api/staff/{rng.choice(staff_ids)}/')
+            if name == 'create_pass':
+                return client.post('/create-pass/submit/', {
+                    'staff_id': rng.choice(staff_ids),
+                    'full_name': f'Visitor {uuid.uuid4().hex[:8]}',
+                    'phone_number': '0900000000',
+                    'photo_data': photo,
+                })
+            return client.get(f'/dashboard/?location={rng.choice(Staff.LOCATION_CHOICES)[0]}')
+
+        started = time.perf_counter()
+        measure_from = started + options['warmup']
+        stop_at = measure_from + options['duration']
+        samples = defaultdict(list)
+        errors = defaultdict(int)
+        lock = threading.Lock()
+        failures = []
+
+        def worker(seed):
+            rng = random.Random(seed)
+            try:
+                if options['url']:
+                    client = HttpClient(options['url'], LOADTEST_USER, options['password'])
+                else:
+                    client = InProcessClient(user)
+            except Exception as e:
+                failures.append(e)
+                return
+            local = defaultdict(list)
+            local_errors = defaultdict(int)
+            try:
+                while True:
+                    now = time.perf_counter()
+                    if now >= stop_at:
+                        break
+                    name = rng.choices(names, weights)[0]
+                    t0 = time.perf_counter()
+                    try:
+                        status = make_request(client, name, rng)
+                    except Exception:
+                        status = 599
+                    elapsed = time.perf_counter() - t0
+                    if t0 < measure_from:
+                        continue
+                    local[name].append(elapsed)
+                    if status >= 300:
+                        local_errors[name] += 1
+            finally:
+                client.close()
+            with lock:
+                for name, values in local.items():
+                    samples[name].extend(values)
+                for name, value in local_errors.items():
+                    errors[name] += value
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(options['concurrency'])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if failures:
+            raise CommandError(f'Client setup failed: {failures[0]}')
+
+        elapsed = options['duration']
+
+        def summarize(values, error_count):
+            values = sorted(values)
+            return {
+                'count': len(values),
+                'errors': error_count,
+                'rps': len(values) / elapsed if elapsed else 0.0,
+                'mean_ms': (sum(values) / len(values) * 1000) if values else 0.0,
+                'p50_ms': _percentile(values, 0.50) * 1000,
+                'p95_ms': _percentile(values, 0.95) * 1000,
+                'p99_ms': _percentile(values, 0.99) * 1000,
+                'max_ms': (values[-1] * 1000) if values else 0.0,
+            }
+
+        endpoints = {name: summarize(samples[name], errors[name]) for name in samples}
+        everything = [value for values in samples.values() for value in values]
+        return {
+            'endpoints': endpoints,
+            'total': summarize(everything, sum(errors.values())),
+        }
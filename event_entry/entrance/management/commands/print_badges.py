@@ -0,0 +1,81 @@
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from entrance.badges import PAPER_SIZES_MM, print_staff
+from entrance.models import Staff
+from entrance.queries import filter_staff
+
+
+class Command(BaseCommand):
+    help = (
+        "Lay out staff badges (QR, name, booth, location, type colour) N per page "
+        "into a PDF or PNG sheets, and mark exactly those staff as printed."
+    )
+
+    def add_arguments(self, parser):
+        # Same filters as the dashboard
+        parser.add_argument("--booth-id", default="", help="Booth ID contains this text.")
+        parser.add_argument("--location", default="", help="Location code (1p, 2p, 3p, 4p, O).")
+        parser.add_argument("--status", default="all", choices=["all", "printed", "not_printed"])
+        parser.add_argument("--sold", default="all", choices=["all", "sold", "not_sold"])
+
+        parser.add_argument("--paper", default="A4", choices=sorted(PAPER_SIZES_MM))
+        parser.add_argument("--per-page", type=int, default=8, help="Badges per page (default: 8).")
+        parser.add_argument("--format", dest="fmt", default="pdf", choices=["pdf", "png"])
+        parser.add_argument(
+            "--output",
+            default=None,
+            help="PDF file or PNG directory (default: BASE_DIR/print_sheets/<timestamp>, outside the served media).",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=None,
+            help="Processes used to render pages (default: all cores).",
+        )
+        parser.add_argument(
+            "--no-mark-printed",
+            action="store_true",
+            help="Do not set printed=True on the exported staff.",
+        )
+
+    def handle(self, *args, **options):
+        if options["per_page"] < 1:
+            self.stderr.write(self.style.ERROR("--per-page must be at least 1"))
+            return
+
+        staff_qs = filter_staff(Staff.objects.all(), {
+            "booth_id": options["booth_id"],
+            "location": options["location"],
+            "status": options["status"],
+            "sold": options["sold"],
+        })
+
+        output = options["output"]
+        if output is None:
+            stamp = timezone.now().strftime("%Y%m%d_%H%M%S")
+            # Sheets carry staff names, so keep them out of MEDIA_ROOT (served)
+            output = Path(settings.BASE_DIR) / "print_sheets" / stamp
+            if options["fmt"] == "pdf":
+                output = output.with_suffix(".pdf")
+
+        written, count = print_staff(
+            staff_qs,
+            output,
+            fmt=options["fmt"],
+            paper=options["paper"],
+            per_page=options["per_page"],
+            workers=options["workers"],
+            mark_printed=not options["no_mark_printed"],
+        )
+
+        if not count:
+            self.stdout.write(self.style.WARNING("No staff matched the filters."))
+            return
+        marked = "not marked" if options["no_mark_printed"] else "marked as printed"
+        self.stdout.write(
+            self.style.SUCCESS(f"Rendered {count} badges into {output} ({len(written)} file(s)); {marked}.")
+        )
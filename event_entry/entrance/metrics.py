@@ -0,0 +1,338 @@
+# entrance/metrics.py
+"""
+In-process metrics in the Prometheus text exposition format (/metrics).
+
+Every thread increments its own shard (a plain dict held in a
+threading.local), so recording takes no lock. A scrape copies and sums
+all shards. With several worker processes, set METRICS_MULTIPROC_DIR:
+each process then writes its totals to <dir>/<pid>_<start>.json (every
+METRICS_FLUSH_SECONDS and at exit), and a scrape on any worker merges
+every file in the directory. Files of workers that have exited stay, so
+counters never go backwards; clear the directory when the whole server
+is restarted. Gauges only count from files written in the last few flush
+intervals, so an exited worker's last value drops out.
+
+Shards of threads that have exited are folded into one retired shard, so
+thread-per-request servers do not grow the shard list. A process forked
+after import (gunicorn --preload) starts with empty shards and its own
+file key.
+"""
+import atexit
+import json
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+_local = threading.local()
+_shards = []            # [(thread, shard)]
+_retired = {}           # merged shards of threads that have exited
+_shards_lock = threading.Lock()
+_metrics = {}
+_pid = None
+_process_key = None
+_flusher = None
+_flusher_lock = threading.Lock()
+
+
+def _enabled():
+    return getattr(settings, 'METRICS_ENABLED', True)
+
+
+def _multiproc_dir():
+    return getattr(settings, 'METRICS_MULTIPROC_DIR', None)
+
+
+def _check_fork():
+    """
+    Reset per-process state when running in a new process (first use, or
+    a worker forked from a parent that already imported this module).
+    """
+    global _pid, _process_key, _flusher, _retired
+    pid = os.getpid()
+    if _pid == pid:
+        return
+    with _shards_lock:
+        if _pid != pid:
+            _shards.clear()
+            _retired = {}
+            # The parent's flusher thread does not exist in a forked child
+            _flusher = None
+            _process_key = f"{pid}_{int(time.time() * 1000)}"
+            _pid = pid
+
+
+def _retire_dead_shards():
+    """
+    Fold shards of exited threads into _retired. Caller holds _shards_lock.
+    """
+    alive = []
+    for thread, shard in _shards:
+        if thread.is_alive():
+            alive.append((thread, shard))
+        else:
+            _merge(_retired, _copy(shard))
+    _shards[:] = alive
+
+
+def _shard():
+    shard = getattr(_local, 'shard', None)
+    if shard is None or _local.pid != os.getpid():
+        _check_fork()
+        shard = {}
+        # Once per thread
+        with _shards_lock:
+            _retire_dead_shards()
+            _shards.append((threading.current_thread(), shard))
+        _local.shard = shard
+        _local.pid = os.getpid()
+        _ensure_flusher()
+    return shard
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        _metrics[name] = self
+
+    def inc(self, *labels, amount=1):
+        if not _enabled():
+            return
+        shard = _shard()
+        key = (self.name, labels)
+        shard[key] = shard.get(key, 0) + amount
+
+
+class Gauge:
+    """
+    Current value read from func() at scrape/flush time (per process,
+    summed over live processes in multiprocess mode).
+    """
+    def __init__(self, name, documentation, func):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = ()
+        self.func = func
+        _metrics[name] = self
+
+
+class Histogram:
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        _metrics[name] = self
+
+    def observe(self, value, *labels):
+        if not _enabled():
+            return
+        shard = _shard()
+        key = (self.name, labels)
+        # [count per bucket..., +Inf count, sum]
+        cells = shard.get(key)
+        if cells is None:
+            cells = shard[key] = [0] * (len(self.buckets) + 1) + [0.0]
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                cells[index] += 1
+                break
+        else:
+            cells[len(self.buckets)] += 1
+        cells[-1] += value
+
+
+VERIFY_TOTAL = Counter(
+    'entrance_verify_total',
+    'Gate verifications by kind (staff/pass) and outcome (ok, offline, duplicate, invalid, wrong_day, not_found).',
+    ('kind', 'result'),
+)
+REQUEST_SECONDS = Histogram(
+    'entrance_request_duration_seconds',
+    'Request latency by view.',
+    ('view',),
+)
+PASSES_CREATED = Counter(
+    'entrance_passes_created_total',
+    'Passes created at the desk; rate(...[1m]) * 60 gives passes per minute.',
+)
+PHOTO_BYTES = Counter(
+    'entrance_photo_upload_bytes_total',
+    'Photo bytes by kind (pass/staff) and stage (received, stored).',
+    ('kind', 'stage'),
+)
+SCANLOG_DROPPED = Counter(
+    'entrance_scanlog_dropped_total',
+    'Scan events dropped because the write-behind queue was over SCAN_LOG_MAX_QUEUE.',
+)
+
+
+def _scanlog_depth():
+    from . import scanlog
+    return scanlog.queue_depth()
+
+
+SCANLOG_QUEUE_DEPTH = Gauge(
+    'entrance_scanlog_queue_depth',
+    'Scan events waiting in the write-behind queue (not yet in the database).',
+    _scanlog_depth,
+)
+
+
+def _merge(into, values):
+    for key, value in values.items():
+        if isinstance(value, list):
+            current = into.get(key)
+            if current is None:
+                into[key] = list(value)
+            else:
+                for index, cell in enumerate(value):
+                    current[index] += cell
+        else:
+            into[key] = into.get(key, 0) + value
+
+
+def _copy(shard):
+    # dict.copy() is atomic under the GIL, the owner may keep writing
+    return {key: list(v) if isinstance(v, list) else v for key, v in shard.copy().items()}
+
+
+def local_snapshot():
+    """
+    Totals of this process: {(name, labels): value or histogram cells},
+    gauges included.
+    """
+    _check_fork()
+    with _shards_lock:
+        _retire_dead_shards()
+        shards = [shard for _, shard in _shards]
+        totals = _copy(_retired)
+    for shard in shards:
+        _merge(totals, _copy(shard))
+    for metric in _metrics.values():
+        if isinstance(metric, Gauge):
+            totals[(metric.name, ())] = metric.func()
+    return totals
+
+
+def flush():
+    """
+    Write this process's totals to METRICS_MULTIPROC_DIR (atomic replace).
+    """
+    directory = _multiproc_dir()
+    if not directory:
+        return
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    rows = [[name, list(labels), value] for (name, labels), value in local_snapshot().items()]
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix='.tmp_', suffix='.json')
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        json.dump(rows, f)
+    os.replace(tmp, directory / f'{_process_key}.json')
+
+
+def _flush_loop():
+    while True:
+        time.sleep(getattr(settings, 'METRICS_FLUSH_SECONDS', 5))
+        try:
+            flush()
+        except OSError:
+            pass
+
+
+def _ensure_flusher():
+    global _flusher
+    _check_fork()
+    if _flusher is not None or not _multiproc_dir():
+        return
+    with _flusher_lock:
+        if _flusher is None:
+            _flusher = threading.Thread(target=_flush_loop, name='metrics-flusher', daemon=True)
+            _flusher.start()
+            atexit.register(flush)
+
+
+def collect():
+    """
+    Merged totals: every process in METRICS_MULTIPROC_DIR, or just this one.
+    """
+    directory = _multiproc_dir()
+    if not directory:
+        return local_snapshot()
+    flush()
+    gauges = {name for name, metric in _metrics.items() if isinstance(metric, Gauge)}
+    # A worker flushes every METRICS_FLUSH_SECONDS; older files are exited workers
+    live_after = time.time() - 3 * getattr(settings, 'METRICS_FLUSH_SECONDS', 5) - 5
+    totals = {}
+    for path in Path(directory).glob('*.json'):
+        if path.name.startswith('.tmp_'):
+            continue
+        try:
+            live = path.stat().st_mtime >= live_after
+            rows = json.loads(path.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            continue
+        _merge(totals, {
+            (name, tuple(labels)): value for name, labels, value in rows
+            if live or name not in gauges
+        })
+    return totals
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (
+        (name, str(value).replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"'))
+        for name, value in pairs
+    )
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render():
+    """
+    Text exposition format (version 0.0.4).
+    """
+    totals = collect()
+    by_metric = {}
+    for (name, labels), value in totals.items():
+        by_metric.setdefault(name, []).append((labels, value))
+
+    lines = []
+    for name, metric in _metrics.items():
+        if isinstance(metric, Histogram):
+            kind = 'histogram'
+        else:
+            kind = 'gauge' if isinstance(metric, Gauge) else 'counter'
+        lines.append(f'# HELP {name} {metric.documentation}')
+        lines.append(f'# TYPE {name} {kind}')
+        series = sorted(by_metric.get(name, []))
+        if kind != 'histogram':
+            if not series and not metric.labelnames:
+                series = [((), 0)]
+            for labels, value in series:
+                lines.append(f'{name}{_labels(metric.labelnames, labels)} {_number(value)}')
+            continue
+        for labels, cells in series:
+            cumulative = 0
+            for bound, count in zip(metric.buckets, cells):
+                cumulative += count
+                lines.append(f'{name}_bucket{_labels(metric.labelnames, labels, [("le", bound)])} {cumulative}')
+            cumulative += cells[len(metric.buckets)]
+            lines.append(f'{name}_bucket{_labels(metric.labelnames, labels, [("le", "+Inf")])} {cumulative}')
+            lines.append(f'{name}_sum{_labels(metric.labelnames, labels)} {_number(float(cells[-1]))}')
+            lines.append(f'{name}_count{_labels(metric.labelnames, labels)} {cumulative}')
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,260 @@
+# entrance/middleware.py
+"""
+Request instrumentation.
+
+MetricsMiddleware feeds the /metrics latency histogram (entrance.metrics).
+
+RequestMetricsMiddleware is opt-in (REQUEST_METRICS_ENABLED).
+
+For each request it records the number of DB queries, total SQL time,
+template render time and wall time. These go out as a Server-Timing
+header (visible in the browser dev tools) and into a rolling per-view
+window. When one SQL shape (the statement with its IN lists collapsed)
+runs more than REQUEST_METRICS_REPEAT_THRESHOLD times in a request, the
+request is flagged and logged as a likely N+1.
+
+Only queries made on the request thread are seen. Async views that hop
+to sync_to_async threads are timed but undercounted.
+"""
+import contextvars
+import logging
+import re
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from . import metrics
+
+
+logger = logging.getLogger(__name__)
+
+_IN_LIST = re.compile(r'\((?:\s*%s\s*,)+\s*%s\s*\)')
+
+_lock = threading.Lock()
+_windows = defaultdict(deque)
+# [seconds, depth] for the current request's template renders (None when not measuring)
+_template_time = contextvars.ContextVar('entrance_template_time', default=None)
+_template_patched = False
+
+
+def _window_size():
+    return getattr(settings, 'REQUEST_METRICS_WINDOW', 500)
+
+
+def _repeat_threshold():
+    return getattr(settings, 'REQUEST_METRICS_REPEAT_THRESHOLD', 10)
+
+
+def sql_shape(sql):
+    """
+    Statement with IN (%s, %s, ...) collapsed, so batches of different
+    sizes count as the same shape.
+    """
+    return _IN_LIST.sub('(%s...)', sql)
+
+
+def _patch_template_render():
+    """
+    Time top-level template renders (render(), TemplateResponse) through the
+    Django template backend; includes and extends are part of that time.
+    """
+    global _template_patched
+    if _template_patched:
+        return
+    from django.template.backends.django import Template
+
+    original = Template.render
+
+    def render(self, *args, **kwargs):
+        spent = _template_time.get()
+        # Renders nested in another (template tags calling render_to_string)
+        # are already inside the outer render's time
+        if spent is None or spent[1]:
+            return original(self, *args, **kwargs)
+        spent[1] += 1
+        started = time.perf_counter()
+        try:
+            return original(self, *args, **kwargs)
+        finally:
+            spent[0] += time.perf_counter() - started
+            spent[1] -= 1
+
+    Template.render = render
+    _template_patched = True
+
+
+class _QueryRecorder:
+    """
+    connection.execute_wrapper callback: counts and times every query.
+    """
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.shapes = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - started
+            self.count += 1
+            self.shapes[sql_shape(sql)] += 1
+
+
+def record(view, wall, queries, sql_seconds, template_seconds, repeated):
+    with _lock:
+        window = _windows[view]
+        window.append((wall, queries, sql_seconds, template_seconds, bool(repeated)))
+        while len(window) > _window_size():
+            window.popleft()
+
+
+def summary():
+    """
+    Rolling per-view summary over the last REQUEST_METRICS_WINDOW requests:
+    {view: {requests, wall_ms_avg, wall_ms_p95, queries_avg, queries_max,
+            sql_ms_avg, template_ms_avg, repeated_sql_requests}}
+    """
+    with _lock:
+        snapshot = {view: list(window) for view, window in _windows.items()}
+    result = {}
+    for view, samples in sorted(snapshot.items()):
+        count = len(samples)
+        walls = sorted(s[0] for s in samples)
+        result[view] = {
+            'requests': count,
+            'wall_ms_avg': round(sum(walls) / count * 1000, 2),
+            'wall_ms_p95': round(walls[min(count - 1, int(0.95 * (count - 1) + 0.5))] * 1000, 2),
+            'queries_avg': round(sum(s[1] for s in samples) / count, 2),
+            'queries_max': max(s[1] for s in samples),
+            'sql_ms_avg': round(sum(s[2] for s in samples) / count * 1000, 2),
+            'template_ms_avg': round(sum(s[3] for s in samples) / count * 1000, 2),
+            'repeated_sql_requests': sum(1 for s in samples if s[4]),
+        }
+    return result
+
+
+def reset():
+    with _lock:
+        _windows.clear()
+
+
+class RequestMetricsMiddleware:
+    """
+    Add to MIDDLEWARE; does nothing unless REQUEST_METRICS_ENABLED is on.
+    Sync and async capable, so the async verify endpoints are not pushed
+    through sync_to_async when it is enabled.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'REQUEST_METRICS_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        _patch_template_render()
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        recorder = _QueryRecorder()
+        template_time = [0.0, 0]  # seconds, nesting depth
+        token = _template_time.set(template_time)
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for alias in connections:
+                    stack.enter_context(connections[alias].execute_wrapper(recorder))
+                response = self.get_response(request)
+        finally:
+            _template_time.reset(token)
+        return self._finish(request, response, recorder, template_time, started)
+
+    async def __acall__(self, request):
+        recorder = _QueryRecorder()
+        template_time = [0.0, 0]
+        token = _template_time.set(template_time)
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for alias in connections:
+                    stack.enter_context(connections[alias].execute_wrapper(recorder))
+                response = await self.get_response(request)
+        finally:
+            _template_time.reset(token)
+        return self._finish(request, response, recorder, template_time, started)
+
+    @staticmethod
+    def _finish(request, response, recorder, template_time, started):
+        wall = time.perf_counter() - started
+
+        match = getattr(request, 'resolver_match', None)
+        view = (match.view_name or match._func_path) if match else 'unresolved'
+        threshold = _repeat_threshold()
+        repeated = [(shape, n) for shape, n in recorder.shapes.most_common(3) if n > threshold]
+        if repeated:
+            logger.warning(
+                'Repeated SQL in %s (%s %s): %s',
+                view, request.method, request.path,
+                '; '.join(f'{n}x {shape[:200]}' for shape, n in repeated),
+            )
+        record(view, wall, recorder.count, recorder.seconds, template_time[0], repeated)
+
+        timing = [
+            f'db;dur={recorder.seconds * 1000:.1f};desc="{recorder.count} queries"',
+            f'tpl;dur={template_time[0] * 1000:.1f}',
+            f'total;dur={wall * 1000:.1f}',
+        ]
+        if repeated:
+            timing.append(f'nplus1;desc="{repeated[0][1]}x same SQL"')
+        existing = response.get('Server-Timing')
+        response['Server-Timing'] = ', '.join(([existing] if existing else []) + timing)
+        return response
+
+
+
+class MetricsMiddleware:
+    """
+    Observe every request's latency in entrance_request_duration_seconds,
+    labelled by view name. Works in front of sync and async views alike,
+    so the async scanner endpoints stay async under ASGI.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'METRICS_ENABLED', True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    @staticmethod
+    def _observe(request, started):
+        match = getattr(request, 'resolver_match', None)
+        # Unresolved paths share one label to keep the series count bounded
+        view = (match.view_name or match._func_path) if match else 'unresolved'
+        metrics.REQUEST_SECONDS.observe(time.perf_counter() - started, view)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        started = time.perf_counter()
+        response = self.get_response(request)
+        self._observe(request, started)
+        return response
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        response = await self.get_response(request)
+        self._observe(request, started)
+        return response
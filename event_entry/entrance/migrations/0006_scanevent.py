@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:25
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('entrance', '0005_add_staff_photo'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScanEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('code', models.CharField(help_text='Staff or pass UUID (or the raw value if it was not a valid code)', max_length=36)),
+                ('kind', models.CharField(choices=[('staff', 'Staff'), ('pass', 'Pass')], max_length=5)),
+                ('gate', models.CharField(blank=True, default='', max_length=50)),
+                ('location', models.CharField(blank=True, default='', max_length=2)),
+                ('result', models.CharField(choices=[('ok', 'Verified'), ('offline', 'Verified (signature only)'), ('invalid', 'Invalid QR'), ('wrong_day', 'Not valid today'), ('not_found', 'Not found')], max_length=10)),
+                ('scanned_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('entrance', '0006_scanevent'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='pass',
+            name='photo_taken_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:37
+
+import entrance.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('entrance', '0007_pass_photo_taken_at_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='pass',
+            index=models.Index(fields=['staff', 'day_entered'], name='pass_staff_day_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='staff',
+            index=models.Index(fields=['location', 'booth_id', 'name'], name='staff_loc_booth_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='staff',
+            index=models.Index(models.F('location'), entrance.models.BoothKey('booth_id'), models.F('id'), name='staff_dashboard_order_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='staff',
+            index=models.Index(fields=['printed', 'location'], name='staff_printed_loc_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='staff',
+            index=models.Index(fields=['sold', 'location'], name='staff_sold_loc_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('entrance', '0008_staff_pass_hot_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='scanevent',
+            name='result',
+            field=models.CharField(choices=[('ok', 'Verified'), ('offline', 'Verified (signature only)'), ('invalid', 'Invalid QR'), ('wrong_day', 'Not valid today'), ('not_found', 'Not found'), ('duplicate', 'Already entered today')], max_length=10),
+        ),
+    ]
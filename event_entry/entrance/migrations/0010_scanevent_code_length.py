@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('entrance', '0009_scanevent_duplicate_result'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='scanevent',
+            name='code',
+            field=models.CharField(help_text='Staff or pass UUID (or the raw value if it was not a valid code)', max_length=255),
+        ),
+    ]
@@ -2,6 +2,17 @@ from django.db import models
 import uuid
 from django.utils import timezone
 
+
+class BoothKey(models.Func):
+    """
+    COALESCE(booth_id, '') with the '' written inline: SQLite only uses an
+    expression index when the query repeats the expression exactly, and a
+    bound parameter never matches.
+    """
+    template = "COALESCE(%(expressions)s, '')"
+    output_field = models.CharField()
+
+
 class Staff(models.Model):
     STAFF_TYPES = (
         ('VIP', 'VIP'),
@@ -39,6 +50,17 @@ class Staff(models.Model):
         help_text="Profile photo for this staff/VIP"
     )
 
+    class Meta:
+        # Match the hot filters; entrance.tests.QueryPlanTests guards them
+        indexes = [
+            # edit_staff / booth lists: location + booth_id, ordered by name
+            models.Index(fields=['location', 'booth_id', 'name'], name='staff_loc_booth_name_idx'),
+            # dashboard keyset order (location, booth_key, id)
+            models.Index('location', BoothKey('booth_id'), 'id', name='staff_dashboard_order_idx'),
+            models.Index(fields=['printed', 'location'], name='staff_printed_loc_idx'),
+            models.Index(fields=['sold', 'location'], name='staff_sold_loc_idx'),
+        ]
+
     @property
     def staff_code(self) -> str:
         """
@@ -61,7 +83,45 @@ class Pass(models.Model):
     printed = models.BooleanField(default=False)  # Track printed status
     qr_code_image = models.ImageField(upload_to='pass_qr/', blank=True, null=True)
     photo = models.ImageField(upload_to='pass_photos/', blank=True, null=True)
-    photo_taken_at = models.DateTimeField(blank=True, null=True)
+    photo_taken_at = models.DateTimeField(blank=True, null=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            # One pass per staff per day (generate_pass_qr, daily lookups)
+            models.Index(fields=['staff', 'day_entered'], name='pass_staff_day_idx'),
+        ]
 
     def __str__(self):
         return f"{self.full_name} | {self.staff.staff_code} | {self.day_entered}"
+
+
+class ScanEvent(models.Model):
+    """
+    One gate scan. Written in batches through entrance.scanlog, never
+    directly from the verify views.
+    """
+    KIND_CHOICES = (
+        ('staff', 'Staff'),
+        ('pass', 'Pass'),
+    )
+
+    RESULT_CHOICES = (
+        ('ok', 'Verified'),
+        ('offline', 'Verified (signature only)'),
+        ('invalid', 'Invalid QR'),
+        ('wrong_day', 'Not valid today'),
+        ('not_found', 'Not found'),
+        ('duplicate', 'Already entered today'),
+    )
+
+    # Wide enough for signed payloads and most malformed scans, so the raw
+    # value of a rejected code is kept for diagnosis
+    code = models.CharField(max_length=255, help_text="Staff or pass UUID (or the raw value if it was not a valid code)")
+    kind = models.CharField(max_length=5, choices=KIND_CHOICES)
+    gate = models.CharField(max_length=50, blank=True, default='')
+    location = models.CharField(max_length=2, blank=True, default='')
+    result = models.CharField(max_length=10, choices=RESULT_CHOICES)
+    scanned_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    def __str__(self):
+        return f"{self.kind} {self.code} | {self.result} | {self.scanned_at}"
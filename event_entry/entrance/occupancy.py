@@ -0,0 +1,276 @@
+# entrance/occupancy.py
+"""
+Per-day admitted set for anti-passback, and occupancy per location.
+
+Every verified gate scan (result 'ok' or 'offline') calls admit(). The
+first scan of a staff/pass id on a day admits it; later scans of the same
+id that day are duplicates (logged as ScanEvent result 'duplicate', and
+refused when ANTI_PASSBACK_BLOCK is on). Occupancy for a location is the
+number of ids admitted there today. There are no exit scans, so it counts
+people who came in, not people still inside.
+
+The set is built from ScanEvent on the first scan after a worker starts,
+plus this worker's events still waiting in the scanlog queue (read from
+memory, nothing is flushed on the request path). At midnight the set
+simply starts empty for the new day. A background thread merges scans
+admitted by other workers every OCCUPANCY_SYNC_SECONDS from the scan log
+(re-reading OCCUPANCY_SYNC_OVERLAP_SECONDS of history, since the log is
+written behind the request). A duplicate that reaches a different worker
+inside that window is not caught.
+
+Memory: ids are kept as the upper 64 bits of the UUID in one set per
+location. Each id costs about 75-80 bytes (36-byte int plus the set slot),
+so 100k admissions take about 8 MB per worker process. At most
+OCCUPANCY_MAX_IDS ids are kept per day (500k by default, about 35 MB).
+Past that limit new ids are still admitted but not remembered, so their
+duplicates go unnoticed; counts() then reports 'saturated'. Only today's
+set is kept.
+"""
+import logging
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+
+logger = logging.getLogger(__name__)
+
+ADMITTED_RESULTS = ('ok', 'offline')
+
+_lock = threading.Lock()
+_day = None
+_by_location = {}
+_size = 0
+_saturated = False
+_synced_at = None
+_watermark = None
+_syncer = None
+_stats = {'admitted': 0, 'duplicates': 0, 'loads': 0, 'syncs': 0}
+
+
+def enabled():
+    return getattr(settings, 'ANTI_PASSBACK_ENABLED', True)
+
+
+def _max_ids():
+    return getattr(settings, 'OCCUPANCY_MAX_IDS', 500_000)
+
+
+def _sync_seconds():
+    return getattr(settings, 'OCCUPANCY_SYNC_SECONDS', 10)
+
+
+def _key(code):
+    # 64 bits of a random UUID: collisions are negligible at event scale
+    return uuid.UUID(str(code)).int >> 64
+
+
+def _day_bounds(day):
+    start = timezone.make_aware(datetime.combine(day, datetime.min.time()))
+    return start, start + timedelta(days=1)
+
+
+def _add(key, location):
+    """
+    Caller holds _lock. True if key was new today.
+    """
+    global _size, _saturated
+    for ids in _by_location.values():
+        if key in ids:
+            return False
+    if _size >= _max_ids():
+        if not _saturated:
+            _saturated = True
+            logger.warning('Occupancy set full (%d ids); further duplicates go undetected today', _size)
+        return True
+    _by_location.setdefault(location or '', set()).add(key)
+    _size += 1
+    return True
+
+
+def _merge(rows):
+    """
+    Add (code, location, scanned_at) rows from the scan log; advances the
+    sync watermark. Caller holds _lock.
+    """
+    global _watermark
+    for code, location, scanned_at in rows:
+        try:
+            key = _key(code)
+        except ValueError:
+            continue
+        _add(key, location)
+        if _watermark is None or scanned_at > _watermark:
+            _watermark = scanned_at
+
+
+def _fetch(since, until):
+    from .models import ScanEvent
+
+    return list(
+        ScanEvent.objects
+        .filter(scanned_at__gte=since, scanned_at__lt=until, result__in=ADMITTED_RESULTS)
+        .values_list('code', 'location', 'scanned_at')
+        .iterator(chunk_size=5000)
+    )
+
+
+def _pending(start, end):
+    """
+    Admitted rows of this worker that the scan log has not written yet.
+    """
+    from . import scanlog
+
+    return [
+        (event.code, event.location, event.scanned_at)
+        for event in scanlog.pending()
+        if event.result in ADMITTED_RESULTS and start <= event.scanned_at < end
+    ]
+
+
+def load(day=None):
+    """
+    Rebuild the admitted set for day (default today) from the scan log.
+    """
+    global _day, _by_location, _size, _saturated, _synced_at, _watermark
+
+    day = day or timezone.localdate()
+    start, end = _day_bounds(day)
+    # Queue first: an event written in between then shows up in both, not neither
+    queued = _pending(start, end)
+    rows = _fetch(start, end) + queued
+    with _lock:
+        _day = day
+        _by_location = {}
+        _size = 0
+        _saturated = False
+        _watermark = None
+        _merge(rows)
+        _synced_at = time.monotonic()
+        _stats['loads'] += 1
+    _ensure_syncer()
+    return _size
+
+
+def _roll_over(day):
+    """
+    Start an empty set for a new day; the next sync fills in other workers.
+    """
+    global _day, _by_location, _size, _saturated, _watermark
+    with _lock:
+        if _day == day:
+            return
+        _day = day
+        _by_location = {}
+        _size = 0
+        _saturated = False
+        _watermark = None
+
+
+def sync():
+    """
+    Merge scans other workers logged since the last sync.
+    """
+    global _synced_at
+    start, end = _day_bounds(_day)
+    overlap = timedelta(seconds=getattr(settings, 'OCCUPANCY_SYNC_OVERLAP_SECONDS', 60))
+    since = max(start, _watermark - overlap) if _watermark else start
+    rows = _fetch(since, end)
+    with _lock:
+        _merge(rows)
+        _synced_at = time.monotonic()
+        _stats['syncs'] += 1
+
+
+def _run():
+    while True:
+        time.sleep(_sync_seconds())
+        try:
+            _roll_over(timezone.localdate())
+            sync()
+        except Exception:
+            logger.exception('Occupancy sync failed')
+        finally:
+            connection.close_if_unusable_or_obsolete()
+
+
+def _ensure_syncer():
+    global _syncer
+    if _syncer is not None and _syncer.is_alive():
+        return
+    with _lock:
+        if _syncer is not None and _syncer.is_alive():
+            return
+        _syncer = threading.Thread(target=_run, name='occupancy-sync', daemon=True)
+        _syncer.start()
+
+
+def is_current():
+    """
+    True when admit() can run without touching the DB (safe in async code).
+    """
+    return _synced_at is not None and _day == timezone.localdate()
+
+
+def ensure_current():
+    """
+    Load on a worker's first scan (touches the DB); at midnight start the
+    new day's empty set. Syncing runs in the background thread.
+    """
+    if _synced_at is None:
+        load()
+    elif _day != timezone.localdate():
+        _roll_over(timezone.localdate())
+
+
+def admit(code, location):
+    """
+    Record an entry. True on the first entry today, False for a duplicate,
+    None when anti-passback is off. Call ensure_current() first (or check
+    is_current() in async code).
+    """
+    if not enabled():
+        return None
+    try:
+        key = _key(code)
+    except ValueError:
+        return None
+    with _lock:
+        first = _add(key, location)
+        _stats['admitted' if first else 'duplicates'] += 1
+    return first
+
+
+def counts():
+    """
+    {'day', 'total', 'saturated', 'locations': [{code, name, count}]} for
+    every location choice (plus '' when scans had no location).
+    """
+    from .models import Staff
+
+    with _lock:
+        sizes = {location: len(ids) for location, ids in _by_location.items()}
+        day, saturated = _day, _saturated
+    locations = [
+        {'code': code, 'name': name, 'count': sizes.pop(code, 0)}
+        for code, name in Staff.LOCATION_CHOICES
+    ]
+    locations += [
+        {'code': code, 'name': code or 'Unknown', 'count': count}
+        for code, count in sorted(sizes.items())
+    ]
+    return {
+        'day': day.isoformat() if day else None,
+        'total': sum(location['count'] for location in locations),
+        'saturated': saturated,
+        'locations': locations,
+    }
+
+
+def stats():
+    with _lock:
+        return {'size': _size, **_stats}
@@ -0,0 +1,101 @@
+# entrance/photos.py
+"""
+Photo normalization shared by create_pass and upload_staff_photo.
+
+Camera frames and phone uploads are decoded once (JPEGs at reduced scale
+via draft mode), rotated according to EXIF orientation, downsized to
+PHOTO_MAX_EDGE and re-encoded as PHOTO_FORMAT without any metadata. If
+the result is over PHOTO_MAX_BYTES, quality and then size are stepped
+down until it fits.
+"""
+import base64
+import binascii
+import io
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+
+MIN_QUALITY = 40
+
+
+class PhotoError(ValueError):
+    pass
+
+
+class NormalizedPhoto:
+    def __init__(self, data, extension, original_bytes, width, height):
+        self.data = data
+        self.extension = extension
+        self.original_bytes = original_bytes
+        self.width = width
+        self.height = height
+
+    @property
+    def bytes_saved(self):
+        return self.original_bytes - len(self.data)
+
+    def as_file(self, stem):
+        return ContentFile(self.data, name=f"{stem}.{self.extension}")
+
+
+def decode_data_url(photo_data):
+    """
+    Decode base64 camera data, with or without a data: URL prefix.
+    Raises PhotoError if it is not valid base64.
+    """
+    # Remove data URL prefix if present
+    if ',' in photo_data:
+        photo_data = photo_data.split(',', 1)[1]
+    try:
+        return base64.b64decode(photo_data)
+    except (binascii.Error, ValueError) as e:
+        raise PhotoError(f'Invalid photo format: {e}')
+
+
+def _encode(image, fmt, quality):
+    out = io.BytesIO()
+    if fmt == 'WEBP':
+        image.save(out, format='WEBP', quality=quality, method=4)
+    else:
+        image.save(out, format='JPEG', quality=quality, optimize=True, progressive=True)
+    return out.getvalue()
+
+
+def normalize_photo(data):
+    """
+    Normalize raw image bytes. Returns a NormalizedPhoto.
+    Raises PhotoError if the bytes are not a readable image.
+    """
+    max_edge = getattr(settings, 'PHOTO_MAX_EDGE', 800)
+    quality = getattr(settings, 'PHOTO_QUALITY', 80)
+    max_bytes = getattr(settings, 'PHOTO_MAX_BYTES', 200 * 1024)
+    fmt = getattr(settings, 'PHOTO_FORMAT', 'JPEG').upper()
+
+    # Corrupt or truncated uploads can fail anywhere in Pillow (open, the
+    # EXIF rotate, resampling, encoding) with a range of exception types
+    try:
+        image = Image.open(io.BytesIO(data))
+        # Let the JPEG decoder scale down by 1/2, 1/4 or 1/8 while decoding
+        image.draft('RGB', (max_edge, max_edge))
+        image = ImageOps.exif_transpose(image)
+        image = image.convert('RGB')
+        image.thumbnail((max_edge, max_edge), Image.LANCZOS)
+
+        encoded = _encode(image, fmt, quality)
+        while len(encoded) > max_bytes:
+            if quality > MIN_QUALITY:
+                quality = max(MIN_QUALITY, quality - 10)
+            elif min(image.size) > 64:
+                image = image.resize((int(image.width * 0.8), int(image.height * 0.8)), Image.LANCZOS)
+            else:
+                break
+            encoded = _encode(image, fmt, quality)
+    except UnidentifiedImageError:
+        raise PhotoError('Unsupported or corrupt image')
+    except (Image.DecompressionBombError, OSError, ValueError, SyntaxError, EOFError) as e:
+        raise PhotoError(f'Invalid image: {e}')
+
+    extension = 'webp' if fmt == 'WEBP' else 'jpg'
+    return NormalizedPhoto(encoded, extension, len(data), image.width, image.height)
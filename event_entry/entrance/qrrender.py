@@ -0,0 +1,89 @@
+# entrance/qrrender.py
+"""
+QR images rendered on request (/qr/<payload>.png|svg).
+
+The image is a pure function of the payload, so the ETag is derived from
+the payload alone (no rendering needed to answer If-None-Match) and
+responses can be cached for a year. Rendered bytes are kept in a
+per-worker LRU bounded by QR_RENDER_CACHE_SIZE entries.
+"""
+import hashlib
+import io
+import threading
+from collections import OrderedDict
+from urllib.parse import quote
+
+import qrcode
+import qrcode.image.svg
+from django.conf import settings
+from django.urls import reverse
+
+
+# Bump when the rendering changes, so clients drop cached images
+RENDER_VERSION = 1
+CONTENT_TYPES = {
+    'png': 'image/png',
+    'svg': 'image/svg+xml',
+}
+
+_lock = threading.Lock()
+_cache = OrderedDict()
+_stats = {'hits': 0, 'misses': 0}
+
+
+def _cache_size():
+    return getattr(settings, 'QR_RENDER_CACHE_SIZE', 4096)
+
+
+def etag(payload, fmt):
+    digest = hashlib.sha256(f'{RENDER_VERSION}:{fmt}:{payload}'.encode('utf-8')).hexdigest()
+    return f'"{digest[:32]}"'
+
+
+def _render(payload, fmt):
+    out = io.BytesIO()
+    if fmt == 'svg':
+        qrcode.make(payload, image_factory=qrcode.image.svg.SvgPathImage).save(out)
+    else:
+        # Same call as utils._write_qr, so files and responses match
+        qrcode.make(payload).save(out, format='PNG')
+    return out.getvalue()
+
+
+def render(payload, fmt='png'):
+    """
+    Image bytes for payload, from the LRU when possible.
+    """
+    if fmt not in CONTENT_TYPES:
+        raise ValueError(f'Unsupported QR format {fmt!r}')
+    key = (fmt, payload)
+    with _lock:
+        data = _cache.get(key)
+        if data is not None:
+            _cache.move_to_end(key)
+            _stats['hits'] += 1
+            return data
+        _stats['misses'] += 1
+
+    # Render outside the lock; two workers racing on one payload is harmless
+    data = _render(payload, fmt)
+    with _lock:
+        _cache[key] = data
+        _cache.move_to_end(key)
+        while len(_cache) > _cache_size():
+            _cache.popitem(last=False)
+    return data
+
+
+def url(payload, fmt='png'):
+    """
+    Path of the rendering endpoint for payload.
+    """
+    base = reverse('qr_image', kwargs={'payload': 'x', 'fmt': fmt})
+    # Swap in the quoted payload ('/' and '|' included) after reversing
+    return base.replace('/x.', f'/{quote(payload, safe="")}.', 1)
+
+
+def stats():
+    with _lock:
+        return {'entries': len(_cache), **_stats}
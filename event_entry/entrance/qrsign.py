@@ -0,0 +1,106 @@
+# entrance/qrsign.py
+"""
+Signed QR payloads that can be verified without touching the database.
+
+Format (colon separated, booth last so it may itself contain ':'):
+
+    E1:<kind>:<uuid hex>:<location>:<day YYYYMMDD or empty>:<booth>:<sig>
+
+kind is 's' (staff) or 'p' (pass). sig is a truncated HMAC-SHA256 over
+everything before it, keyed with QR_SIGNING_KEY (defaults to SECRET_KEY).
+Legacy payloads (bare UUID, "pass_id|booth|location") are still accepted
+by the verify views; they just always need a lookup.
+"""
+import base64
+import hmac
+import uuid
+from datetime import datetime
+
+from django.conf import settings
+from django.core.signing import BadSignature
+from django.utils.crypto import salted_hmac
+
+
+PREFIX = 'E1'
+KIND_STAFF = 's'
+KIND_PASS = 'p'
+SIG_BYTES = 12
+
+
+class SignedPayload:
+    __slots__ = ('kind', 'id', 'location', 'booth_id', 'day')
+
+    def __init__(self, kind, id, location, booth_id, day):
+        self.kind = kind
+        self.id = id
+        self.location = location
+        self.booth_id = booth_id
+        self.day = day
+
+    def valid_on(self, day):
+        return self.day is None or self.day == day
+
+
+def _signature(body):
+    mac = salted_hmac(
+        'entrance.qrsign',
+        body,
+        secret=getattr(settings, 'QR_SIGNING_KEY', None) or settings.SECRET_KEY,
+        algorithm='sha256',
+    )
+    return base64.urlsafe_b64encode(mac.digest()[:SIG_BYTES]).decode('ascii').rstrip('=')
+
+
+def sign(kind, obj_id, location, booth_id, day=None):
+    """
+    Build a signed payload. day (a date) limits validity to that day;
+    None means valid on any day.
+    """
+    day_str = day.strftime('%Y%m%d') if day else ''
+    body = ':'.join([PREFIX, kind, uuid.UUID(str(obj_id)).hex, location or '', day_str, booth_id or ''])
+    return f"{body}:{_signature(body)}"
+
+
+def is_signed(payload):
+    return str(payload).startswith(PREFIX + ':')
+
+
+def verify(payload):
+    """
+    Check a signed payload purely in CPU and return a SignedPayload.
+    Raises BadSignature if it is malformed or was tampered with.
+    """
+    body, _, sig = str(payload).rpartition(':')
+    if not body or not hmac.compare_digest(sig, _signature(body)):
+        raise BadSignature('QR signature does not match')
+
+    parts = body.split(':', 5)
+    if len(parts) != 6 or parts[1] not in (KIND_STAFF, KIND_PASS):
+        raise BadSignature('Malformed QR payload')
+    _, kind, id_hex, location, day_str, booth_id = parts
+    try:
+        obj_id = str(uuid.UUID(id_hex))
+        day = datetime.strptime(day_str, '%Y%m%d').date() if day_str else None
+    except ValueError:
+        raise BadSignature('Malformed QR payload')
+    return SignedPayload(kind, obj_id, location, booth_id or None, day)
+
+
+def signing_enabled():
+    return getattr(settings, 'QR_SIGNED_PAYLOADS', False)
+
+
+def staff_payload(staff):
+    """
+    What goes inside a staff QR: signed when QR_SIGNED_PAYLOADS is on,
+    otherwise the bare staff_code (UUID) as before.
+    """
+    if not signing_enabled():
+        return staff.staff_code
+    return sign(KIND_STAFF, staff.id, staff.location, staff.booth_id)
+
+
+def pass_payload(pass_obj, location):
+    if not signing_enabled():
+        return f"{pass_obj.id}|{pass_obj.booth_id or ''}|{location or ''}"
+    return sign(KIND_PASS, pass_obj.id, location, pass_obj.booth_id, pass_obj.day_entered)
@@ -0,0 +1,82 @@
+# entrance/queries.py
+"""
+Staff querysets shared by the views and the management commands.
+"""
+import json
+import uuid
+
+from django.db.models import Exists, OuterRef, Q
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+
+from .models import BoothKey, Pass, Staff
+
+
+def filter_staff(queryset, params):
+    """
+    Apply the dashboard filters (booth_id, location, status, sold) from a
+    GET-style dict. Shared by every view that works on "what the dashboard
+    currently shows".
+    """
+    booth_filter = params.get('booth_id', '')
+    location_filter = params.get('location', '')
+    status_filter = params.get('status', 'all')
+    sold_filter = params.get('sold', 'all')
+
+    if booth_filter:
+        queryset = queryset.filter(booth_id__icontains=booth_filter)
+    if location_filter:
+        queryset = queryset.filter(location=location_filter)
+
+    # Filter by printed status
+    if status_filter == 'printed':
+        queryset = queryset.filter(printed=True)
+    elif status_filter == 'not_printed':
+        queryset = queryset.filter(printed=False)
+
+    # Filter by sold status
+    if sold_filter == 'sold':
+        queryset = queryset.filter(sold=True)
+    elif sold_filter == 'not_sold':
+        queryset = queryset.filter(sold=False)
+
+    return queryset
+
+
+def dashboard_queryset(params):
+    """
+    Filtered staff annotated with booth_key (keyset sort key) and
+    any_printed, as listed on the dashboard (unordered, unpaginated).
+    """
+    # any_printed comes from one EXISTS subquery instead of a query per row
+    return filter_staff(Staff.objects.all(), params).annotate(
+        booth_key=BoothKey('booth_id'),
+        any_printed=Exists(Pass.objects.filter(staff=OuterRef('pk'), printed=True)),
+    )
+
+
+def encode_cursor(staff):
+    raw = json.dumps([staff.location, staff.booth_key, str(staff.id)])
+    return urlsafe_base64_encode(raw.encode('utf-8'))
+
+
+def decode_cursor(value):
+    try:
+        location, booth_key, staff_id = json.loads(urlsafe_base64_decode(value).decode('utf-8'))
+        return location, booth_key, uuid.UUID(staff_id)
+    except (ValueError, TypeError):
+        return None
+
+
+def keyset_q(cursor, forward=True):
+    """
+    Rows strictly after (or before) cursor in (location, booth_key, id) order.
+    """
+    location, booth_key, staff_id = cursor
+    op = 'gt' if forward else 'lt'
+    # The leading location bound turns this into one range on the
+    # dashboard order index instead of an OR of three index lookups
+    return Q(**{f'location__{op}e': location}) & (
+        Q(**{f'location__{op}': location})
+        | Q(location=location, **{f'booth_key__{op}': booth_key})
+        | Q(location=location, booth_key=booth_key, **{f'id__{op}': staff_id})
+    )
@@ -0,0 +1,218 @@
+# entrance/roster.py
+"""
+Per-worker roster cache for the gate verification path.
+
+Every gate scan resolves a staff UUID to a handful of display fields.
+Instead of hitting SQLite on each scan, each worker keeps a dict of
+UUID -> StaffRecord, loaded once on first use (or at startup via warm()).
+
+Invalidation:
+  - post_save / post_delete on Staff update or drop single entries
+    (see entrance.signals).
+  - QuerySet.update()/bulk_* do not send model signals, so code paths
+    using them send entrance.signals.staff_bulk_changed, which calls
+    invalidate().
+  - Other workers only see our signals if they run in the same process,
+    so the whole roster is also reloaded after ROSTER_CACHE_TTL seconds.
+"""
+import threading
+import time
+import uuid
+
+from django.conf import settings
+
+
+ROSTER_FIELDS = ('id', 'name', 'phone_number', 'booth_id', 'location', 'staff_type')
+
+
+class StaffRecord:
+    """
+    Compact, read-only view of a Staff row with the attributes the
+    verify templates and the staff-info API use.
+    """
+    __slots__ = ('id', 'name', 'phone_number', 'booth_id', 'location', 'staff_type')
+
+    def __init__(self, id, name, phone_number, booth_id, location, staff_type):
+        self.id = id
+        self.name = name
+        self.phone_number = phone_number
+        self.booth_id = booth_id
+        self.location = location
+        self.staff_type = staff_type
+
+    @classmethod
+    def from_values(cls, row):
+        return cls(
+            id=str(row['id']),
+            name=row['name'],
+            phone_number=row['phone_number'],
+            booth_id=row['booth_id'],
+            location=row['location'],
+            staff_type=row['staff_type'],
+        )
+
+    @classmethod
+    def from_instance(cls, staff):
+        return cls.from_values({
+            'id': staff.id,
+            'name': staff.name,
+            'phone_number': staff.phone_number,
+            'booth_id': staff.booth_id,
+            'location': staff.location,
+            'staff_type': staff.staff_type,
+        })
+
+    @property
+    def staff_code(self):
+        return self.id
+
+    @property
+    def qr_url(self):
+        # Rendered from the payload (entrance.qrrender), no stored file needed
+        if not self.id:
+            return None
+        from . import qrrender, qrsign
+        return qrrender.url(qrsign.staff_payload(self))
+
+    def get_location_display(self):
+        from .models import Staff
+        return dict(Staff.LOCATION_CHOICES).get(self.location, self.location)
+
+    def get_staff_type_display(self):
+        from .models import Staff
+        return dict(Staff.STAFF_TYPES).get(self.staff_type, self.staff_type)
+
+
+_lock = threading.Lock()
+# (records dict, loaded_at monotonic time) or None when not loaded. Swapped
+# as one object so a reader never pairs records with a cleared timestamp.
+_state = None
+_stats = {'hits': 0, 'misses': 0, 'loads': 0}
+
+
+def _ttl():
+    return getattr(settings, 'ROSTER_CACHE_TTL', 300)
+
+
+def normalize_code(staff_code):
+    """
+    Return the canonical UUID string for a scanned code.
+    Raises ValueError if it is not a UUID.
+    """
+    return str(uuid.UUID(str(staff_code)))
+
+
+def _load():
+    global _state
+    from .models import Staff
+
+    records = {
+        str(row['id']): StaffRecord.from_values(row)
+        for row in Staff.objects.values(*ROSTER_FIELDS).iterator()
+    }
+    with _lock:
+        _state = (records, time.monotonic())
+        _stats['loads'] += 1
+    return records
+
+
+def warm():
+    """
+    (Re)load the full roster in one query.
+    """
+    return len(_load())
+
+
+def _fresh_records():
+    """
+    The loaded records dict, or None when not loaded or expired.
+    """
+    state = _state
+    if state is None or time.monotonic() - state[1] > _ttl():
+        return None
+    return state[0]
+
+
+def _ensure_loaded():
+    records = _fresh_records()
+    if records is None:
+        records = _load()
+    return records
+
+
+def get(staff_code):
+    """
+    Look up a staff record by (already validated) UUID string.
+    Falls back to the database on a miss so staff created in another
+    worker are found immediately. Returns None if the staff does not exist.
+    """
+    from .models import Staff
+
+    records = _ensure_loaded()
+    key = normalize_code(staff_code)
+    record = records.get(key)
+    if record is not None:
+        _stats['hits'] += 1
+        return record
+
+    _stats['misses'] += 1
+    row = Staff.objects.filter(id=key).values(*ROSTER_FIELDS).first()
+    if row is None:
+        return None
+    record = StaffRecord.from_values(row)
+    with _lock:
+        records[key] = record
+    return record
+
+
+def peek(staff_code):
+    """
+    Cache-only lookup (no DB access, safe to call from async code).
+    Returns None on a miss or when the roster is not loaded/expired;
+    callers then fall back to get().
+    """
+    records = _fresh_records()
+    if records is None:
+        return None
+    record = records.get(normalize_code(staff_code))
+    if record is not None:
+        _stats['hits'] += 1
+    return record
+
+
+def update(staff):
+    """
+    Refresh a single entry from a saved Staff instance.
+    """
+    state = _state
+    if state is None:
+        return
+    with _lock:
+        state[0][str(staff.id)] = StaffRecord.from_instance(staff)
+
+
+def discard(staff_id):
+    state = _state
+    if state is None:
+        return
+    with _lock:
+        state[0].pop(str(staff_id), None)
+
+
+def invalidate():
+    """
+    Drop the whole roster; the next lookup reloads it.
+    """
+    global _state
+    with _lock:
+        _state = None
+
+
+def stats():
+    state = _state
+    return {
+        'size': len(state[0]) if state else 0,
+        'hits': _stats['hits'],
+        'misses': _stats['misses'],
+        'loads': _stats['loads'],
+    }
@@ -0,0 +1,150 @@
+# entrance/scanlog.py
+"""
+Write-behind buffer for ScanEvent rows.
+
+The verify views call record(), which only appends to an in-process
+queue. A daemon thread writes the queue with one bulk_create whenever
+SCAN_LOG_BATCH_SIZE events are waiting or SCAN_LOG_FLUSH_MS has passed,
+and flush() runs once more at interpreter exit (worker shutdown).
+If a flush fails (e.g. SQLite busy) the events go back on the queue;
+beyond SCAN_LOG_MAX_QUEUE the oldest events are dropped and counted.
+"""
+import atexit
+import collections
+import logging
+import threading
+
+from django.conf import settings
+from django.db import DatabaseError, connection
+from django.utils import timezone
+
+from . import metrics
+
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_queue = collections.deque()
+_inflight = {}          # batches taken by flush() and not yet committed
+_wakeup = threading.Event()
+_flusher = None
+_stats = {'flushed': 0, 'dropped': 0, 'failed_flushes': 0}
+
+
+def _batch_size():
+    return getattr(settings, 'SCAN_LOG_BATCH_SIZE', 200)
+
+
+def _flush_interval():
+    return getattr(settings, 'SCAN_LOG_FLUSH_MS', 500) / 1000.0
+
+
+def _max_queue():
+    return getattr(settings, 'SCAN_LOG_MAX_QUEUE', 50000)
+
+
+def record(code, kind, result, gate='', location=''):
+    """
+    Queue one scan. Never touches the database.
+    """
+    if not getattr(settings, 'SCAN_LOG_ENABLED', True):
+        return
+    from .models import ScanEvent
+
+    event = ScanEvent(
+        code=str(code)[:ScanEvent._meta.get_field('code').max_length],
+        kind=kind,
+        result=result,
+        gate=(gate or '')[:50],
+        location=location or '',
+        scanned_at=timezone.now(),
+    )
+    with _lock:
+        _queue.append(event)
+        overflow = len(_queue) - _max_queue()
+        for _ in range(max(overflow, 0)):
+            _queue.popleft()
+            _stats['dropped'] += 1
+        depth = len(_queue)
+    if overflow > 0:
+        metrics.SCANLOG_DROPPED.inc(amount=overflow)
+
+    _ensure_flusher()
+    if depth >= _batch_size():
+        _wakeup.set()
+
+
+def flush():
+    """
+    Write everything queued so far. Returns the number of rows written.
+    """
+    from .models import ScanEvent
+
+    token = object()
+    with _lock:
+        events = list(_queue)
+        _queue.clear()
+        if events:
+            _inflight[token] = events
+    if not events:
+        return 0
+
+    try:
+        ScanEvent.objects.bulk_create(events, batch_size=_batch_size())
+    except DatabaseError:
+        logger.warning('Scan log flush of %d events failed, requeueing', len(events), exc_info=True)
+        with _lock:
+            _queue.extendleft(reversed(events))
+            _stats['failed_flushes'] += 1
+        return 0
+    finally:
+        with _lock:
+            _inflight.pop(token, None)
+
+    with _lock:
+        _stats['flushed'] += len(events)
+    return len(events)
+
+
+def pending():
+    """
+    This worker's events that may not be in the database yet (queued or
+    being written), oldest first. Never touches the database.
+    """
+    with _lock:
+        return [event for batch in _inflight.values() for event in batch] + list(_queue)
+
+
+def _run():
+    while True:
+        _wakeup.wait(_flush_interval())
+        _wakeup.clear()
+        try:
+            flush()
+        except Exception:
+            logger.exception('Scan log flusher error')
+        finally:
+            # Do not keep a broken/stale connection around in this thread
+            connection.close_if_unusable_or_obsolete()
+
+
+def _ensure_flusher():
+    global _flusher
+    if _flusher is not None and _flusher.is_alive():
+        return
+    with _lock:
+        if _flusher is not None and _flusher.is_alive():
+            return
+        _flusher = threading.Thread(target=_run, name='scanlog-flusher', daemon=True)
+        _flusher.start()
+
+
+def queue_depth():
+    return len(_queue)
+
+
+def stats():
+    return {'queue_depth': len(_queue), **_stats}
+
+
+atexit.register(flush)
@@ -0,0 +1,47 @@
+# entrance/signals.py
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver, Signal
+
+from .models import Pass, Staff
+from . import roster, booths, dbtune, live
+
+
+# QuerySet.update() and bulk_create/bulk_update send no model signals;
+# send this (sender=Staff) after using them so caches are dropped. Pass
+# ids=[staff ids] when they are known, so live streams can send the rows.
+staff_bulk_changed = Signal()
+
+
+@receiver(post_save, sender=Staff)
+def staff_saved(sender, instance, **kwargs):
+    roster.update(instance)
+    booths.invalidate()
+    live.mark_changed([instance.id])
+
+
+@receiver(post_delete, sender=Staff)
+def staff_deleted(sender, instance, **kwargs):
+    roster.discard(instance.id)
+    booths.invalidate()
+    live.mark_changed([instance.id])
+
+
+@receiver(staff_bulk_changed, sender=Staff)
+def staff_bulk_updated(sender, ids=None, **kwargs):
+    roster.invalidate()
+    booths.invalidate()
+    live.mark_changed(ids)
+
+
+@receiver(post_save, sender=Pass)
+@receiver(post_delete, sender=Pass)
+def pass_changed(sender, instance, **kwargs):
+    live.mark_changed([instance.staff_id])
+
+
+@receiver(connection_created)
+def tune_sqlite(sender, connection, **kwargs):
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            dbtune.apply(cursor)
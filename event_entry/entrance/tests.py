@@ -0,0 +1,79 @@
+# entrance/tests.py
+import re
+import unittest
+import uuid
+from datetime import timedelta
+
+from django.db import connection
+from django.db.models import Exists, OuterRef
+from django.test import TestCase
+from django.utils import timezone
+
+from .models import Staff, Pass
+from .queries import dashboard_queryset, keyset_q
+
+
+HOT_TABLES = ('entrance_staff', 'entrance_pass')
+# "SCAN entrance_staff" (SQLite >= 3.36) or "SCAN TABLE entrance_staff"; a
+# "SCAN ... USING [COVERING] INDEX" walks an index and is fine
+FULL_SCAN = re.compile(r'\bSCAN (?:TABLE )?(\w+)(?: AS \w+)?\s*$')
+
+
+def hot_queries():
+    """
+    (label, queryset, whole_table) for the filters the views and commands
+    run most. whole_table marks queries that must read every staff row
+    anyway; only their inner lookups have to be indexed.
+    """
+    day = timezone.localdate()
+    cursor = ('1p', '1', uuid.UUID(int=0))
+    return [
+        ('dashboard: first page',
+         dashboard_queryset({}).order_by('location', 'booth_key', 'id')[:101], False),
+        ('dashboard: location filter',
+         dashboard_queryset({'location': '1p'}).order_by('location', 'booth_key', 'id')[:101], False),
+        ('dashboard: next page',
+         dashboard_queryset({}).filter(keyset_q(cursor)).order_by('location', 'booth_key', 'id')[:101], False),
+        ('dashboard: previous page',
+         dashboard_queryset({}).filter(keyset_q(cursor, forward=False))
+         .order_by('-location', '-booth_key', '-id')[:101], False),
+        ('dashboard: not printed',
+         dashboard_queryset({'status': 'not_printed'}).order_by('location', 'booth_key', 'id')[:101], False),
+        ('dashboard: sold',
+         dashboard_queryset({'sold': 'sold'}).order_by('location', 'booth_key', 'id')[:101], False),
+        ('edit_staff: booth group',
+         Staff.objects.filter(booth_id='1', location='1p'), False),
+        ('booth_staff_list',
+         Staff.objects.filter(location='1p', booth_id='1').order_by('name'), False),
+        ('booth_qr_zip: location',
+         Staff.objects.filter(location='1p').order_by('booth_id', 'name'), False),
+        ('generate_pass_qr: staff without a pass',
+         Staff.objects.filter(~Exists(Pass.objects.filter(staff=OuterRef('pk'), day_entered=day))),
+         True),
+        ('cleanup_pass_photos: expired photos',
+         Pass.objects.filter(photo_taken_at__lt=timezone.now() - timedelta(hours=12), photo__isnull=False)
+         .exclude(photo='').order_by('photo_taken_at')[:500], False),
+        ('verify_pass: by id',
+         Pass.objects.select_related('staff').filter(id=uuid.UUID(int=0)), False),
+    ]
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', 'Plans are checked for SQLite only')
+class QueryPlanTests(TestCase):
+    """
+    Hot Staff/Pass queries must stay on an index; fails when a change to
+    the queries or the model indexes makes SQLite fall back to a full scan.
+    """
+
+    def test_hot_queries_use_an_index(self):
+        for label, queryset, whole_table in hot_queries():
+            with self.subTest(label):
+                plan = queryset.explain()
+                scans = [
+                    match.group(1)
+                    for match in map(FULL_SCAN.search, plan.splitlines())
+                    if match and match.group(1) in HOT_TABLES
+                ]
+                if whole_table:
+                    scans = [table for table in scans if table != queryset.model._meta.db_table]
+                self.assertEqual(scans, [], f'{label} falls back to a full scan:\n{plan}')
@@ -1,25 +1,123 @@
 # entrance/utils.py
+import os
+import tempfile
 import qrcode
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from django.conf import settings
 
 
-def generate_qr(staff_code: str) -> str:
+# Read once at import (os.umask can only be read by setting it): mkstemp
+# creates 0600 files, and QR images must stay readable by the web server
+# and export consumers like a normally created file would be.
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+FILE_MODE = 0o666 & ~_UMASK
+
+
+def _qr_dir() -> Path:
+    qr_dir = Path(settings.MEDIA_ROOT) / 'staff_qr'
+    qr_dir.mkdir(parents=True, exist_ok=True)
+    return qr_dir
+
+
+def _write_qr(payload: str, file_path: Path) -> None:
+    """
+    Render a QR PNG into a temp file next to file_path and rename it into
+    place, so readers never see a half-written image.
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=file_path.parent, prefix='.tmp_', suffix='.png')
+    try:
+        with os.fdopen(fd, 'wb') as tmp:
+            qrcode.make(payload).save(tmp, format='PNG')
+            os.fchmod(tmp.fileno(), FILE_MODE)
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def _render_chunk(qr_dir: str, items: list) -> None:
+    """
+    Process-pool worker: render a chunk of (code, payload) pairs. Only
+    receives plain strings, so it does not need Django settings in the
+    child process.
+    """
+    qr_dir = Path(qr_dir)
+    for code, payload in items:
+        _write_qr(payload, qr_dir / f"staff_{code}.png")
+
+
+def generate_qr(staff_code: str, payload: str = None) -> str:
     """
     Generate QR image using staff_code (STABLE)
+    payload is what gets encoded (e.g. a signed payload from
+    entrance.qrsign); it defaults to staff_code itself.
     Returns absolute file path
     """
 
-    qr_dir = Path(settings.MEDIA_ROOT) / 'staff_qr'
-    qr_dir.mkdir(parents=True, exist_ok=True)
-
-    file_path = qr_dir / f"staff_{staff_code}.png"
+    file_path = _qr_dir() / f"staff_{staff_code}.png"
 
     # 🔒 DO NOT regenerate if already exists
     if file_path.exists():
         return str(file_path)
 
-    qr = qrcode.make(staff_code)
-    qr.save(file_path)
+    _write_qr(payload or staff_code, file_path)
 
     return str(file_path)
+
+
+def store_qr_files() -> bool:
+    """
+    QR_STORE_FILES: keep a PNG per Staff/Pass in qr_code_image. When off,
+    imports and pass creation write no files and pages use
+    /qr/<payload>.png (entrance.qrrender). The bulk exports (booth ZIP,
+    badge sheets, export_booth_qr) always work from generate_qr files.
+    """
+    return getattr(settings, 'QR_STORE_FILES', True)
+
+
+def attach_qr(instance, code: str, payload: str) -> None:
+    """
+    Point instance.qr_code_image at generate_qr's file and save that field.
+    The file is referenced in place rather than copied through the storage
+    backend, so each QR is written once. No-op when QR_STORE_FILES is off.
+    """
+    if not store_qr_files():
+        return
+    file_path = generate_qr(code, payload)
+    instance.qr_code_image.name = os.path.relpath(file_path, settings.MEDIA_ROOT).replace(os.sep, '/')
+    instance.save(update_fields=['qr_code_image'])
+
+
+def generate_qr_batch(codes, workers=None, chunk_size=64) -> dict:
+    """
+    Generate QR images for many codes at once.
+    codes is an iterable of codes, or a {code: payload} dict when the
+    encoded payload differs from the code (see generate_qr).
+    Codes that already have an image are skipped; the rest are split into
+    chunks and rendered by a process pool (workers=None uses every core,
+    workers=1 renders in this process).
+    Returns {code: absolute file path} for every requested code.
+    """
+    if not isinstance(codes, dict):
+        codes = {code: code for code in codes}
+    qr_dir = _qr_dir()
+    paths = {code: qr_dir / f"staff_{code}.png" for code in codes}
+    missing = [(code, codes[code]) for code, path in paths.items() if not path.exists()]
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    chunks = [missing[i:i + chunk_size] for i in range(0, len(missing), chunk_size)]
+
+    if workers <= 1 or len(chunks) <= 1:
+        for chunk in chunks:
+            _render_chunk(str(qr_dir), chunk)
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(chunks))) as pool:
+            futures = [pool.submit(_render_chunk, str(qr_dir), chunk) for chunk in chunks]
+            for future in futures:
+                future.result()
+
+    return {code: str(path) for code, path in paths.items()}
@@ -1,16 +1,32 @@
+from asgiref.sync import sync_to_async
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
+from django.contrib import messages
 from django.contrib.auth import views as auth_views
 from django.utils import timezone
-from django.http import JsonResponse, FileResponse
-from django.views.decorators.http import require_POST
+from django.http import HttpResponse, JsonResponse, FileResponse, StreamingHttpResponse
+from django.views.decorators.http import condition, require_POST
 from django.shortcuts import get_object_or_404
-from django.core.files import File
 from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.signing import BadSignature
+from django.db import DatabaseError, transaction
+from django.db.models import Count, Q
+from django.utils.http import url_has_allowed_host_and_scheme, urlencode
 from pathlib import Path
 from .models import Staff, Pass
-from .utils import generate_qr
+from .utils import attach_qr, generate_qr
+from .photos import PhotoError, decode_data_url, normalize_photo
+from .zipstream import iter_zip
+from .badges import PAPER_SIZES_MM, print_staff
+from . import roster, booths
+from .queries import dashboard_queryset, decode_cursor, encode_cursor, filter_staff, keyset_q
+from .signals import staff_bulk_changed
+from . import metrics, occupancy, qrrender, qrsign, scanlog
+import json
 import os
+import shutil
+import tempfile
 
 
 
@@ -25,6 +41,73 @@ def admin_redirect(request):
 
 
 
+DASHBOARD_FILTER_PARAMS = ('booth_id', 'location', 'status', 'sold', 'page_size')
+
+
+def metrics_view(request):
+    """
+    Prometheus scrape endpoint (text exposition format).
+    """
+    token = getattr(settings, 'METRICS_TOKEN', None)
+    if token and request.headers.get('Authorization', '') != f'Bearer {token}':
+        return HttpResponse('Unauthorized', status=401, content_type='text/plain')
+    return HttpResponse(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+@login_required
+def live_stream(request):
+    """
+    Server-Sent Events: a counter snapshot, then deltas and changed staff
+    rows as Staff/Pass change (entrance.live). Every stream in a worker
+    shares one snapshot, so connected pages cost no per-client queries.
+
+    Under WSGI a stream holds a worker thread for as long as the page is
+    open, so it is only served there with LIVE_STREAM_WSGI. Otherwise the
+    reply is 204, which stops EventSource reconnecting, and the pages poll
+    live_snapshot instead.
+    """
+    from django.core.handlers.asgi import ASGIRequest
+    from . import live
+
+    is_asgi = isinstance(request, ASGIRequest)
+    if not is_asgi and not getattr(settings, 'LIVE_STREAM_WSGI', False):
+        return HttpResponse(status=204)
+    last_id = request.headers.get('Last-Event-ID') or request.GET.get('last_id')
+    events = live.astream(last_id) if is_asgi else live.stream(last_id)
+    response = StreamingHttpResponse(events, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Stop nginx-style proxies from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@login_required
+def live_snapshot(request):
+    """
+    Current live counters as JSON, polled by the pages when the /live/
+    stream is not available (see live_stream).
+    """
+    from . import live
+
+    return JsonResponse({
+        **live.build_snapshot(),
+        'poll_seconds': getattr(settings, 'LIVE_FALLBACK_POLL_SECONDS', 15),
+    })
+
+
+@login_required
+def request_metrics(request):
+    """
+    Rolling per-view request metrics (REQUEST_METRICS_ENABLED).
+    """
+    from .middleware import summary
+
+    return JsonResponse({
+        'enabled': getattr(settings, 'REQUEST_METRICS_ENABLED', False),
+        'views': summary(),
+    })
+
+
 @login_required
 def dashboard(request):
     booth_filter = request.GET.get('booth_id', '')
@@ -32,64 +115,235 @@ def dashboard(request):
     status_filter = request.GET.get('status', 'all')
     sold_filter = request.GET.get('sold', 'all')
 
-    staff_list = Staff.objects.all()
-    if booth_filter:
-        staff_list = staff_list.filter(booth_id__icontains=booth_filter)
-    if location_filter:
-        staff_list = staff_list.filter(location=location_filter)
-
-    # Filter by printed status
-    if status_filter == 'printed':
-        staff_list = staff_list.filter(printed=True)
-    elif status_filter == 'not_printed':
-        staff_list = staff_list.filter(printed=False)
-
-    # Filter by sold status
-    if sold_filter == 'sold':
-        staff_list = staff_list.filter(sold=True)
-    elif sold_filter == 'not_sold':
-        staff_list = staff_list.filter(sold=False)
-
-    # Annotate if any pass is printed
-    for staff in staff_list:
-        staff.any_printed = staff.passes.filter(printed=True).exists()
+    default_page_size = getattr(settings, 'DASHBOARD_PAGE_SIZE', 100)
+    try:
+        page_size = int(request.GET.get('page_size', default_page_size))
+    except ValueError:
+        page_size = default_page_size
+    page_size = max(1, min(page_size, getattr(settings, 'DASHBOARD_MAX_PAGE_SIZE', 1000)))
+
+    staff_list = dashboard_queryset(request.GET)
+
+    # Keyset pagination on (location, booth_key, id)
+    after = decode_cursor(request.GET['after']) if request.GET.get('after') else None
+    before = decode_cursor(request.GET['before']) if request.GET.get('before') else None
+    if before is not None:
+        rows = list(
+            staff_list.filter(keyset_q(before, forward=False))
+            .order_by('-location', '-booth_key', '-id')[:page_size + 1]
+        )
+        has_prev = len(rows) > page_size
+        rows = rows[:page_size][::-1]
+        has_next = True
+    else:
+        if after is not None:
+            staff_list = staff_list.filter(keyset_q(after))
+        rows = list(staff_list.order_by('location', 'booth_key', 'id')[:page_size + 1])
+        has_next = len(rows) > page_size
+        rows = rows[:page_size]
+        has_prev = after is not None
+
+    # All counters in a single conditional aggregate
+    counts = Staff.objects.aggregate(
+        total_count=Count('id'),
+        printed_count=Count('id', filter=Q(printed=True)),
+        not_printed_count=Count('id', filter=Q(printed=False)),
+        sold_count=Count('id', filter=Q(sold=True)),
+        not_sold_count=Count('id', filter=Q(sold=False)),
+    )
+
+    filter_query = urlencode({
+        key: request.GET[key] for key in DASHBOARD_FILTER_PARAMS if request.GET.get(key)
+    })
 
     context = {
-        'staff_list': staff_list,
+        'staff_list': rows,
         'booth_filter': booth_filter,
         'location_filter': location_filter,
         'status_filter': status_filter,
         'sold_filter': sold_filter,
-        'total_count': Staff.objects.count(),
-        'printed_count': Staff.objects.filter(printed=True).count(),
-        'not_printed_count': Staff.objects.filter(printed=False).count(),
-        'sold_count': Staff.objects.filter(sold=True).count(),
-        'not_sold_count': Staff.objects.filter(sold=False).count(),
+        'page_size': page_size,
+        'filter_query': filter_query,
+        'next_cursor': encode_cursor(rows[-1]) if rows and has_next else '',
+        'prev_cursor': encode_cursor(rows[0]) if rows and has_prev else '',
+        **counts,
     }
     return render(request, 'dashboard.html', context)
 
 
+class _RemoveOnClose:
+    """
+    Wrap a file or chunk iterator so that close() also deletes a temp
+    directory. Responses close their content once it has been sent, or
+    when the client goes away before that.
+    """
+    def __init__(self, source, directory):
+        self.source = source
+        self.directory = directory
+        if hasattr(source, 'read'):
+            # FileResponse streams anything with read(); name gives it the size
+            self.read = source.read
+            self.name = source.name
+
+    def __iter__(self):
+        return iter(self.source)
+
+    def close(self):
+        try:
+            if hasattr(self.source, 'close'):
+                self.source.close()
+        finally:
+            shutil.rmtree(self.directory, ignore_errors=True)
+
+
+@login_required
 @require_POST
-def save_printed(request):
+def print_sheet(request):
     """
-    Saves printed (checkbox) state per Staff.
-    Only checked staff will be marked as printed=True.
-    Unchecked staff will be printed=False.
+    Render print sheets (PDF, or a ZIP of PNG sheets) for the staff
+    matching the dashboard filters posted with the form, and mark exactly
+    those staff as printed.
     """
+    paper = request.POST.get('paper', 'A4')
+    fmt = request.POST.get('format', 'pdf')
+    if paper not in PAPER_SIZES_MM or fmt not in ('pdf', 'png'):
+        return JsonResponse({'success': False, 'error': 'Invalid paper or format'}, status=400)
+    try:
+        per_page = max(1, min(int(request.POST.get('per_page', 8)), 48))
+    except ValueError:
+        per_page = 8
+
+    staff_qs = filter_staff(Staff.objects.all(), request.POST)
+    stamp = timezone.now().strftime('%Y%m%d_%H%M%S_%f')
+    # Sheets carry staff names, booths and locations: render into a private temp
+    # directory (never MEDIA_ROOT) that is removed once the response is sent
+    tmp_dir = tempfile.mkdtemp(prefix='print_sheet_')
+    output = Path(tmp_dir) / (f'{stamp}.pdf' if fmt == 'pdf' else stamp)
+    try:
+        written, count = print_staff(
+            staff_qs, output, fmt=fmt, paper=paper, per_page=per_page,
+            workers=getattr(settings, 'BADGE_SHEET_WORKERS', 1),
+        )
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+    if not count:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        return JsonResponse({'success': False, 'error': 'No staff matched the filters'}, status=404)
+
+    if fmt == 'pdf':
+        return FileResponse(
+            _RemoveOnClose(open(output, 'rb'), tmp_dir), as_attachment=True, filename=f'badges_{stamp}.pdf',
+        )
+    response = StreamingHttpResponse(
+        _RemoveOnClose(iter_zip((path.name, str(path)) for path in written), tmp_dir),
+        content_type='application/zip',
+    )
+    response['Content-Disposition'] = f'attachment; filename="badges_{stamp}.zip"'
+    return response
 
-    # IDs of checked staff from the form
-    checked_ids = request.POST.getlist('printed_staff')
 
-    # Reset all to False first
-    Staff.objects.update(printed=False)
+@require_POST
+def save_printed(request):
+    """
+    Saves printed (checkbox) state for the rows visible on the dashboard.
+    The form posts every visible ID (visible_staff), the ones that were
+    printed when the page was rendered (was_printed) and the ones checked
+    now (printed_staff); only the difference is written, in two UPDATEs.
+    """
+    visible = set(request.POST.getlist('visible_staff'))
+    was_printed = set(request.POST.getlist('was_printed')) & visible
+    checked = set(request.POST.getlist('printed_staff'))
+    if visible:
+        checked &= visible
 
-    # Set checked staff to True
-    if checked_ids:
-        Staff.objects.filter(id__in=checked_ids).update(printed=True)
+    to_print = checked - was_printed
+    to_unprint = was_printed - checked
 
+    try:
+        with transaction.atomic():
+            # The printed= guard skips rows someone else already changed
+            marked = Staff.objects.filter(id__in=to_print, printed=False).update(printed=True) if to_print else 0
+            unmarked = Staff.objects.filter(id__in=to_unprint, printed=True).update(printed=False) if to_unprint else 0
+    except ValidationError:
+        return JsonResponse({'success': False, 'error': 'Invalid staff id'}, status=400)
+    if marked or unmarked:
+        staff_bulk_changed.send(sender=Staff, ids=list(to_print | to_unprint))
+
+    result = {'success': True, 'marked_printed': marked, 'marked_not_printed': unmarked, 'changed': marked + unmarked}
+    if 'application/json' in request.headers.get('Accept', ''):
+        return JsonResponse(result)
+
+    messages.success(request, f"Printed status saved: {marked} marked printed, {unmarked} marked not printed.")
+    next_url = request.POST.get('next', '')
+    if url_has_allowed_host_and_scheme(next_url, allowed_hosts={request.get_host()}):
+        return redirect(next_url)
     return redirect('dashboard')
 
 
+BULK_ACTIONS = ('printed', 'sold', 'location', 'delete')
+
+
+@login_required
+@require_POST
+def staff_bulk(request):
+    """
+    Apply one action to many staff in a single UPDATE/DELETE.
+
+    JSON body:
+      {"action": "printed" | "sold" | "location" | "delete",
+       "value": true/false (printed, sold) or a location code (location),
+       "ids": [staff ids]  -- or --
+       "filter": {"booth_id", "location", "status", "sold"}  (dashboard filters)}
+
+    Returns {"success", "action", "matched", "affected"}.
+    """
+    try:
+        body = json.loads(request.body or b'{}')
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'Invalid JSON'}, status=400)
+    if not isinstance(body, dict):
+        return JsonResponse({'success': False, 'error': 'Invalid JSON'}, status=400)
+
+    action = body.get('action')
+    value = body.get('value')
+    ids = body.get('ids')
+    filters = body.get('filter')
+    if action not in BULK_ACTIONS:
+        return JsonResponse({'success': False, 'error': f'action must be one of {", ".join(BULK_ACTIONS)}'}, status=400)
+    if action in ('printed', 'sold') and not isinstance(value, bool):
+        return JsonResponse({'success': False, 'error': 'value must be true or false'}, status=400)
+    if action == 'location' and value not in dict(Staff.LOCATION_CHOICES):
+        return JsonResponse({'success': False, 'error': 'Invalid location'}, status=400)
+
+    # Refuse to act on the whole table by accident: need ids or at least one filter
+    if ids:
+        if not isinstance(ids, list):
+            return JsonResponse({'success': False, 'error': 'ids must be a list'}, status=400)
+        try:
+            staff_qs = Staff.objects.filter(id__in=ids)
+        except ValidationError:
+            return JsonResponse({'success': False, 'error': 'Invalid staff id'}, status=400)
+    elif isinstance(filters, dict) and any(filters.get(key) not in (None, '', 'all') for key in ('booth_id', 'location', 'status', 'sold')):
+        staff_qs = filter_staff(Staff.objects.all(), filters)
+    else:
+        return JsonResponse({'success': False, 'error': 'Give ids or a non-empty filter'}, status=400)
+
+    with transaction.atomic():
+        matched = staff_qs.count()
+        if action == 'delete':
+            _, per_model = staff_qs.delete()
+            affected = per_model.get(Staff._meta.label, 0)
+        else:
+            # Only rows that actually change
+            affected = staff_qs.exclude(**{action: value}).update(**{action: value})
+
+    if affected:
+        # Deletes already went through post_delete; only updates need the ids
+        staff_bulk_changed.send(sender=Staff, ids=ids if ids and action != 'delete' else None)
+    return JsonResponse({'success': True, 'action': action, 'matched': matched, 'affected': affected})
+
+
 @require_POST
 def toggle_printed(request, staff_id):
     """
@@ -133,19 +387,15 @@ def edit_staff(request, staff_id):
             location=location,
             staff_type=staff_type,
         )
+        # update() bypasses post_save, so drop cached roster/booth data explicitly
+        staff_bulk_changed.send(sender=Staff)
 
         # Refresh instance from DB (values just updated)
         staff.refresh_from_db()
 
         # Ensure it has a QR code (using staff_code, which scan expects)
         if not staff.qr_code_image:
-            qr_path = generate_qr(staff.staff_code)
-            with open(qr_path, 'rb') as f:
-                staff.qr_code_image.save(
-                    f'staff_{staff.staff_code}.png',
-                    File(f),
-                    save=True
-                )
+            attach_qr(staff, staff.staff_code, qrsign.staff_payload(staff))
 
         # Refresh booth queryset if booth_id or location changed
         booth_qs = Staff.objects.filter(booth_id=staff.booth_id, location=staff.location)
@@ -162,13 +412,7 @@ def edit_staff(request, staff_id):
                     location=location,
                     staff_type=staff_type,
                 )
-                qr_path = generate_qr(new_staff.staff_code)
-                with open(qr_path, 'rb') as f:
-                    new_staff.qr_code_image.save(
-                        f'staff_{new_staff.staff_code}.png',
-                        File(f),
-                        save=True
-                    )
+                attach_qr(new_staff, new_staff.staff_code, qrsign.staff_payload(new_staff))
 
         # Decrease: delete extra staff (excluding the current one first)
         elif desired_count < current_count:
@@ -197,9 +441,6 @@ def download_qr(request, staff_id):
     import os
     from django.http import FileResponse
     staff = get_object_or_404(Staff, id=staff_id)
-    if not staff.qr_code_image:
-        return JsonResponse({'error': 'No QR'})
-    path = staff.qr_code_image.path
     # Descriptive download name without altering QR content
     # Example: STAFF_2Pav02_AuiXMVA.png
     prefix = (staff.staff_type or 'STAFF').upper()
@@ -207,29 +448,163 @@ def download_qr(request, staff_id):
     location = (staff.location or 'NoLoc').replace(' ', '_')
     short_id = str(staff.id).replace('-', '')[:8]
     download_name = f"{prefix}_{booth}_{location}_{short_id}.png"
-    return FileResponse(open(path, 'rb'), as_attachment=True, filename=download_name)
+    if staff.qr_code_image and staff.qr_code_image.storage.exists(staff.qr_code_image.name):
+        return FileResponse(staff.qr_code_image.open('rb'), as_attachment=True, filename=download_name)
+    # No stored file (QR_STORE_FILES off): render the same image from the payload
+    response = HttpResponse(qrrender.render(qrsign.staff_payload(staff), 'png'), content_type='image/png')
+    response['Content-Disposition'] = f'attachment; filename="{download_name}"'
+    return response
+
+
+@condition(etag_func=lambda request, payload, fmt: qrrender.etag(payload, fmt))
+def qr_image(request, payload, fmt):
+    """
+    QR image for any payload, rendered on request (entrance.qrrender).
+    The bytes depend only on the payload, so responses carry a strong ETag
+    and may be cached by browsers and proxies for a year.
+    """
+    if len(payload) > getattr(settings, 'QR_MAX_PAYLOAD_LENGTH', 512):
+        return HttpResponse('Payload too long', status=400, content_type='text/plain')
+    response = HttpResponse(qrrender.render(payload, fmt), content_type=qrrender.CONTENT_TYPES[fmt])
+    response['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
 
 def scan_qr(request):
     return render(request, 'scan.html')
 
 
+def _check_signed(payload):
+    """
+    Validate a signed QR payload in CPU only.
+    Returns (SignedPayload, None) or (None, error message).
+    """
+    try:
+        signed = qrsign.verify(payload)
+    except BadSignature:
+        return None, 'Invalid QR'
+    if not signed.valid_on(timezone.localdate()):
+        return None, 'QR not valid today'
+    return signed, None
+
+
+def _offline_staff(signed):
+    """
+    Staff details carried by a signed payload, used when the DB is unavailable.
+    """
+    return roster.StaffRecord(
+        id=signed.id if signed.kind == qrsign.KIND_STAFF else None,
+        name=None,
+        phone_number=None,
+        booth_id=signed.booth_id,
+        location=signed.location,
+        staff_type=None,
+    )
+
+
+ALREADY_ENTERED = 'Already entered today'
+
+
+def _details_only(request):
+    """
+    ?view=1 on the HTML verify pages: opened from the scanner page after
+    the JSON verify already logged and admitted the scan, so nothing is
+    recorded again.
+    """
+    return getattr(request, 'scan_details_only', False)
+
+
+def _log_scan(request, kind, code, result, location=''):
+    """
+    Queue a ScanEvent (written behind the request by entrance.scanlog).
+    """
+    if _details_only(request):
+        return
+    scanlog.record(code, kind, result, gate=request.GET.get('gate', ''), location=location)
+    metrics.VERIFY_TOTAL.inc(kind, result)
+
+
+def _ensure_occupancy():
+    """
+    Bring the admitted set up to date; skipped while the DB is unavailable
+    so offline verification keeps working.
+    """
+    try:
+        occupancy.ensure_current()
+    except DatabaseError:
+        pass
+
+
+def _log_entry(request, kind, code, result, location=''):
+    """
+    _log_scan for a verified scan, with anti-passback (entrance.occupancy):
+    a repeat entry of the same id today is logged as 'duplicate'.
+    Returns True for a duplicate.
+    """
+    if _details_only(request):
+        return False
+    duplicate = occupancy.admit(code, location) is False
+    _log_scan(request, kind, code, 'duplicate' if duplicate else result, location)
+    return duplicate
+
+
+def _passback_refused(duplicate):
+    return duplicate and getattr(settings, 'ANTI_PASSBACK_BLOCK', False)
+
+
+def _render_scan(request, context):
+    """
+    Render the scan result page with today's occupancy per location.
+    """
+    return render(request, 'pass.html', {**context, 'occupancy': occupancy.counts()})
+
+
 def verify_staff(request, staff_code):
     """
-    QR contains ONLY staff_code (e.g. 2PS110)
+    QR contains ONLY staff_code (e.g. 2PS110), or a signed payload
+    (entrance.qrsign) that is checked without touching the DB.
     """
-    import uuid
+    request.scan_details_only = request.GET.get('view') == '1'
+    if qrsign.is_signed(staff_code):
+        signed, error = _check_signed(staff_code)
+        if error:
+            _log_scan(request, 'staff', staff_code, 'invalid' if error == 'Invalid QR' else 'wrong_day')
+            return _render_scan(request, {'error': error})
+        if signed.kind == qrsign.KIND_PASS:
+            return verify_pass(request, staff_code)
+        _ensure_occupancy()
+        try:
+            staff = roster.get(signed.id)
+        except DatabaseError:
+            # Signature already proves the code is genuine; DB only adds details
+            duplicate = _log_entry(request, 'staff', signed.id, 'offline', signed.location)
+            if _passback_refused(duplicate):
+                return _render_scan(request, {'error': ALREADY_ENTERED})
+            return _render_scan(request, {'staff': _offline_staff(signed), 'offline': True, 'duplicate': duplicate})
+        if staff is None:
+            _log_scan(request, 'staff', signed.id, 'not_found')
+            return _render_scan(request, {'error': 'Staff not found'})
+        duplicate = _log_entry(request, 'staff', staff.id, 'ok', staff.location)
+        if _passback_refused(duplicate):
+            return _render_scan(request, {'error': ALREADY_ENTERED})
+        return _render_scan(request, {'staff': staff, 'duplicate': duplicate})
+
     # staff_code in our QR is currently the UUID string (primary key)
     try:
-        uuid.UUID(str(staff_code))
+        roster.normalize_code(staff_code)
     except ValueError:
-        return render(request, 'pass.html', {'error': 'Invalid QR'})
+        _log_scan(request, 'staff', staff_code, 'invalid')
+        return _render_scan(request, {'error': 'Invalid QR'})
 
-    try:
-        staff = Staff.objects.get(id=staff_code)
-    except Staff.DoesNotExist:
-        return render(request, 'pass.html', {'error': 'Staff not found'})
+    _ensure_occupancy()
+    staff = roster.get(staff_code)
+    if staff is None:
+        _log_scan(request, 'staff', staff_code, 'not_found')
+        return _render_scan(request, {'error': 'Staff not found'})
 
-    return render(request, 'pass.html', {'staff': staff})
+    duplicate = _log_entry(request, 'staff', staff.id, 'ok', staff.location)
+    if _passback_refused(duplicate):
+        return _render_scan(request, {'error': ALREADY_ENTERED})
+    return _render_scan(request, {'staff': staff, 'duplicate': duplicate})
 
 
 def verify_pass(request, pass_id):
@@ -237,45 +612,187 @@ def verify_pass(request, pass_id):
     Verify a pass by scanning its QR code (pass ID).
     Shows pass info with photo if available.
     """
-    from datetime import timedelta
     import uuid
-    
+
+    request.scan_details_only = request.GET.get('view') == '1'
+
+    signed = None
+    if qrsign.is_signed(pass_id):
+        signed, error = _check_signed(pass_id)
+        if error:
+            _log_scan(request, 'pass', pass_id, 'invalid' if error == 'Invalid QR' else 'wrong_day')
+            return _render_scan(request, {'error': error})
+        if signed.kind == qrsign.KIND_STAFF:
+            return verify_staff(request, pass_id)
+        pass_id = signed.id
+
     # Support payloads like "pass_id|booth|location"
-    if '|' in pass_id:
+    elif '|' in pass_id:
         pass_id = pass_id.split('|', 1)[0]
 
     # Validate UUID format early; if invalid, show error
     try:
         uuid.UUID(str(pass_id))
     except ValueError:
-        return render(request, 'pass.html', {
+        _log_scan(request, 'pass', pass_id, 'invalid')
+        return _render_scan(request, {
             'error': 'Invalid QR'
         })
 
+    _ensure_occupancy()
     try:
-        pass_obj = Pass.objects.get(id=pass_id)
+        pass_obj = Pass.objects.select_related('staff').get(id=pass_id)
     except Pass.DoesNotExist:
-        return render(request, 'pass.html', {
+        _log_scan(request, 'pass', pass_id, 'not_found')
+        return _render_scan(request, {
             'error': 'Pass not found'
         })
+    except DatabaseError:
+        if signed is None:
+            raise
+        duplicate = _log_entry(request, 'pass', pass_id, 'offline', signed.location)
+        if _passback_refused(duplicate):
+            return _render_scan(request, {'error': ALREADY_ENTERED})
+        return _render_scan(request, {'staff': _offline_staff(signed), 'offline': True, 'duplicate': duplicate})
     
-    # Check if photo is older than 12 hours and delete it
-    if pass_obj.photo_taken_at:
-        time_diff = timezone.now() - pass_obj.photo_taken_at
-        if time_diff > timedelta(hours=12):
-            # Delete photo after 12 hours
-            if pass_obj.photo:
-                pass_obj.photo.delete()
-                pass_obj.photo = None
-                pass_obj.photo_taken_at = None
-                pass_obj.save()
-
-    return render(request, 'pass.html', {
+    photo_expired = _photo_expired(pass_obj)
+
+    duplicate = _log_entry(request, 'pass', pass_obj.id, 'ok', pass_obj.staff.location)
+    if _passback_refused(duplicate):
+        return _render_scan(request, {'error': ALREADY_ENTERED})
+    return _render_scan(request, {
         'pass_obj': pass_obj,
-        'staff': pass_obj.staff
+        'staff': pass_obj.staff,
+        'photo_expired': photo_expired,
+        'duplicate': duplicate,
+        'pass_qr_url': qrrender.url(qrsign.pass_payload(pass_obj, pass_obj.staff.location)),
+    })
+
+
+def _photo_expired(pass_obj):
+    """
+    Photos past PASS_PHOTO_TTL_HOURS are hidden by the verify views and
+    removed by cleanup_pass_photos; a gate scan never deletes files or
+    writes to the DB.
+    """
+    from datetime import timedelta
+
+    ttl = timedelta(hours=getattr(settings, 'PASS_PHOTO_TTL_HOURS', 12))
+    return bool(pass_obj.photo_taken_at and timezone.now() - pass_obj.photo_taken_at > ttl)
+
+
+def _staff_json(staff):
+    return {
+        'id': staff.id,
+        'name': staff.name,
+        'phone_number': staff.phone_number,
+        'staff_type': staff.staff_type,
+        'booth_id': staff.booth_id,
+        'location': staff.location,
+        'location_display': staff.get_location_display(),
+    }
+
+
+def _entry_json(request, kind, code, result, location, data):
+    """
+    JSON response for a verified scan, after the anti-passback check.
+    """
+    duplicate = _log_entry(request, kind, code, result, location)
+    if _passback_refused(duplicate):
+        return JsonResponse({'success': False, 'duplicate': True, 'error': ALREADY_ENTERED})
+    return JsonResponse({
+        'success': True,
+        'kind': kind,
+        **({'offline': True} if result == 'offline' else {}),
+        'duplicate': duplicate,
+        **data,
+    })
+
+
+async def _verify_json(request, code, kind):
+    """
+    Shared body of the async JSON verify endpoints. Same rules and scan
+    log entries as verify_staff/verify_pass, without template rendering.
+    """
+    signed = None
+    if qrsign.is_signed(code):
+        signed, error = _check_signed(code)
+        if error:
+            _log_scan(request, kind, code, 'invalid' if error == 'Invalid QR' else 'wrong_day')
+            return JsonResponse({'success': False, 'error': error})
+        kind = 'pass' if signed.kind == qrsign.KIND_PASS else 'staff'
+        code = signed.id
+    elif kind == 'pass' and '|' in code:
+        code = code.split('|', 1)[0]
+
+    try:
+        code = roster.normalize_code(code)
+    except ValueError:
+        _log_scan(request, kind, code, 'invalid')
+        return JsonResponse({'success': False, 'error': 'Invalid QR'})
+
+    if not occupancy.is_current():
+        await sync_to_async(_ensure_occupancy)()
+
+    if kind == 'staff':
+        try:
+            # Roster hit costs no I/O; only a miss goes to the DB (in a thread)
+            staff = roster.peek(code) or await sync_to_async(roster.get)(code)
+        except DatabaseError:
+            if signed is None:
+                raise
+            return _entry_json(request, kind, code, 'offline', signed.location, {'staff': _staff_json(_offline_staff(signed))})
+        if staff is None:
+            _log_scan(request, kind, code, 'not_found')
+            return JsonResponse({'success': False, 'error': 'Staff not found'})
+        return _entry_json(request, kind, code, 'ok', staff.location, {'staff': _staff_json(staff)})
+
+    try:
+        pass_obj = await Pass.objects.select_related('staff').aget(id=code)
+    except Pass.DoesNotExist:
+        _log_scan(request, kind, code, 'not_found')
+        return JsonResponse({'success': False, 'error': 'Pass not found'})
+    except DatabaseError:
+        if signed is None:
+            raise
+        return _entry_json(request, kind, code, 'offline', signed.location, {'staff': _staff_json(_offline_staff(signed))})
+
+    return _entry_json(request, kind, code, 'ok', pass_obj.staff.location, {
+        'staff': _staff_json(roster.StaffRecord.from_instance(pass_obj.staff)),
+        'pass': {
+            'id': str(pass_obj.id),
+            'full_name': pass_obj.full_name,
+            'phone_number': pass_obj.phone_number,
+            'booth_id': pass_obj.booth_id,
+            'day_entered': pass_obj.day_entered.isoformat(),
+            'photo_url': pass_obj.photo.url if pass_obj.photo and not _photo_expired(pass_obj) else None,
+        },
     })
 
 
+def occupancy_json(request):
+    """
+    Today's admissions per location (entrance.occupancy), as seen by this
+    worker; other workers' scans are merged every OCCUPANCY_SYNC_SECONDS.
+    """
+    _ensure_occupancy()
+    return JsonResponse(occupancy.counts())
+
+
+async def api_verify_staff(request, staff_code):
+    """
+    Async JSON twin of verify_staff for the scanner page.
+    """
+    return await _verify_json(request, staff_code, 'staff')
+
+
+async def api_verify_pass(request, pass_id):
+    """
+    Async JSON twin of verify_pass for the scanner page.
+    """
+    return await _verify_json(request, pass_id, 'pass')
+
+
 # Use Django's built-in auth views for login/logout, wired in urls.py
 
 
@@ -287,40 +804,10 @@ def booth_files(request):
     Interactive file browser with expand/collapse, add/delete staff.
     """
     base_dir = Path(getattr(settings, "BOOTH_QR_EXPORT_ROOT", settings.BASE_DIR / "booth_qr_export"))
-    locations = []
 
-    # Get unique locations and booths from database (more reliable than filesystem)
-    location_set = set(Staff.objects.values_list('location', flat=True).distinct())
-    
-    for loc_code in sorted(location_set):
-        if not loc_code:
-            continue
-        loc_display = dict(Staff.LOCATION_CHOICES).get(loc_code, loc_code)
-        booths = []
-        booth_set = set(Staff.objects.filter(location=loc_code).values_list('booth_id', flat=True).distinct())
-        
-        for booth_id in sorted(booth_set):
-            if not booth_id:
-                continue
-            qs = Staff.objects.filter(location=loc_code, booth_id=booth_id)
-            staff_count = qs.count()
-            printed_count = qs.filter(printed=True).count()
-            sold_count = qs.filter(sold=True).count()
-            photo_count = qs.exclude(photo__isnull=True).exclude(photo='').count()
-            booths.append({
-                "name": booth_id,
-                "staff_count": staff_count,
-                "printed_count": printed_count,
-                "sold_count": sold_count,
-                "photo_count": photo_count,
-            })
-        
-        if booths:
-            locations.append({
-                "code": loc_code,
-                "name": loc_display,
-                "booths": booths,
-            })
+    # Locations and booths come from the database (more reliable than filesystem),
+    # aggregated in one GROUP BY and cached until Staff changes
+    locations = booths.get_tree()
 
     context = {
         "base_dir": str(base_dir),
@@ -329,6 +816,59 @@ def booth_files(request):
     return render(request, "booth_files.html", context)
 
 
+@login_required
+def booth_qr_zip(request):
+    """
+    Stream a ZIP of the QR PNGs (plus staff_list.csv) for one booth
+    (?location=..&booth_id=..) or a whole location (?location=.. only).
+    Files are read straight from MEDIA_ROOT/staff_qr and stored
+    uncompressed, so memory use does not grow with the number of files.
+    """
+    import csv
+    import io
+
+    location = request.GET.get('location', '')
+    booth_id = request.GET.get('booth_id', '')
+    if not location:
+        return JsonResponse({'success': False, 'error': 'location is required'}, status=400)
+
+    staff_qs = Staff.objects.filter(location=location)
+    if booth_id:
+        staff_qs = staff_qs.filter(booth_id=booth_id)
+    staff_list = list(
+        staff_qs.order_by('booth_id', 'name')
+        .only('id', 'name', 'phone_number', 'staff_type', 'booth_id', 'location')
+    )
+    if not staff_list:
+        return JsonResponse({'success': False, 'error': 'No staff found'}, status=404)
+
+    def arcname(staff):
+        if booth_id:
+            return f"{staff.staff_code}.png"
+        return f"{staff.booth_id or 'no_booth'}/{staff.staff_code}.png"
+
+    listing = io.StringIO()
+    writer = csv.writer(listing)
+    writer.writerow(['staff_code', 'name', 'phone_number', 'staff_type', 'location', 'booth_id', 'file'])
+    for staff in staff_list:
+        writer.writerow([
+            staff.staff_code, staff.name, staff.phone_number, staff.staff_type,
+            staff.location, staff.booth_id or '', arcname(staff),
+        ])
+
+    def entries():
+        yield 'staff_list.csv', listing.getvalue().encode('utf-8')
+        for staff in staff_list:
+            # Existing images are used as-is; a missing one is rendered once
+            yield arcname(staff), generate_qr(staff.staff_code, qrsign.staff_payload(staff))
+
+    name_parts = [location] + ([booth_id] if booth_id else [])
+    download_name = "qr_" + "_".join(part.replace(' ', '_').replace('/', '-') for part in name_parts) + ".zip"
+    response = StreamingHttpResponse(iter_zip(entries()), content_type='application/zip')
+    response['Content-Disposition'] = f'attachment; filename="{download_name}"'
+    return response
+
+
 @login_required
 def booth_staff_list(request, location, booth_id):
     """
@@ -345,7 +885,7 @@ def booth_staff_list(request, location, booth_id):
             'staff_code': staff.staff_code,
             'printed': staff.printed,
             'sold': staff.sold,
-            'qr_url': staff.qr_code_image.url if staff.qr_code_image else None,
+            'qr_url': qrrender.url(qrsign.staff_payload(staff)),
             'photo_url': staff.photo.url if staff.photo else None,
         })
     return JsonResponse({'staff': data})
@@ -373,13 +913,7 @@ def booth_add_staff(request, location, booth_id):
     )
 
     # Generate QR code
-    qr_path = generate_qr(new_staff.staff_code)
-    with open(qr_path, 'rb') as f:
-        new_staff.qr_code_image.save(
-            f'staff_{new_staff.staff_code}.png',
-            File(f),
-            save=True
-        )
+    attach_qr(new_staff, new_staff.staff_code, qrsign.staff_payload(new_staff))
 
     return JsonResponse({
         'success': True,
@@ -389,7 +923,7 @@ def booth_add_staff(request, location, booth_id):
             'phone': new_staff.phone_number,
             'staff_type': new_staff.staff_type,
             'staff_code': new_staff.staff_code,
-            'qr_url': new_staff.qr_code_image.url if new_staff.qr_code_image else None,
+            'qr_url': qrrender.url(qrsign.staff_payload(new_staff)),
         }
     })
 
@@ -424,28 +958,20 @@ def get_staff_info(request, staff_code):
     """
     API endpoint: Get staff info by staff_code (for pass creation).
     """
-    import uuid
     try:
-        uuid.UUID(str(staff_code))
+        roster.normalize_code(staff_code)
     except ValueError:
         return JsonResponse({'success': False, 'error': 'Invalid QR'})
 
-    try:
-        staff = Staff.objects.get(id=staff_code)
-        return JsonResponse({
-            'success': True,
-            'staff': {
-                'id': str(staff.id),
-                'name': staff.name,
-                'phone_number': staff.phone_number,
-                'staff_type': staff.staff_type,
-                'booth_id': staff.booth_id,
-                'location_display': staff.get_location_display(),
-            }
-        })
-    except Staff.DoesNotExist:
+    staff = roster.get(staff_code)
+    if staff is None:
         return JsonResponse({'success': False, 'error': 'Staff not found'})
 
+    return JsonResponse({
+        'success': True,
+        'staff': _staff_json(staff),
+    })
+
 
 @login_required
 @require_POST
@@ -453,10 +979,10 @@ def create_pass(request):
     """
     Create a pass with captured photo. Photo auto-deletes after 12 hours.
     """
-    import base64
-    from django.core.files.base import ContentFile
-    from datetime import timedelta
-    
+    import logging
+
+    logger = logging.getLogger(__name__)
+
     staff_id = request.POST.get('staff_id')
     full_name = request.POST.get('full_name', '').strip()
     phone_number = request.POST.get('phone_number', '').strip()
@@ -469,6 +995,15 @@ def create_pass(request):
         staff = Staff.objects.get(id=staff_id)
     except Staff.DoesNotExist:
         return JsonResponse({'success': False, 'error': 'Staff not found'})
+
+    # Decode, orient, downsize and re-encode the photo before touching the DB
+    photo = None
+    if photo_data:
+        try:
+            photo = normalize_photo(decode_data_url(photo_data))
+        except PhotoError as e:
+            # Continue without photo if there's an error
+            logger.warning(f'Error processing pass photo: {e}')
     
     # Create Pass
     pass_obj = Pass.objects.create(
@@ -480,35 +1015,26 @@ def create_pass(request):
         photo_taken_at=timezone.now(),
     )
     
-    # Save photo from base64 data
-    if photo_data:
-        try:
-            # Remove data URL prefix if present
-            if ',' in photo_data:
-                photo_data = photo_data.split(',')[1]
-            
-            image_data = base64.b64decode(photo_data)
-            photo_file = ContentFile(image_data, name=f'pass_{pass_obj.id}.jpg')
-            pass_obj.photo.save(photo_file.name, photo_file, save=True)
-        except Exception as e:
-            print(f"Error saving photo: {e}")
-            # Continue without photo if there's an error
+    # Save normalized photo
+    if photo is not None:
+        photo_file = photo.as_file(f'pass_{pass_obj.id}')
+        pass_obj.photo.save(photo_file.name, photo_file, save=True)
+        logger.info(f'Pass photo for {pass_obj.id}: {photo.original_bytes} -> {len(photo.data)} bytes')
+        metrics.PHOTO_BYTES.inc('pass', 'received', amount=photo.original_bytes)
+        metrics.PHOTO_BYTES.inc('pass', 'stored', amount=len(photo.data))
     
     # Generate QR code for the pass (encode pass_id + booth + location)
-    from .utils import generate_qr
-    qr_payload = f"{pass_obj.id}|{staff.booth_id or ''}|{staff.location or ''}"
-    qr_path = generate_qr(qr_payload)
-    with open(qr_path, 'rb') as f:
-        # Include booth and location in the stored filename for clarity
-        booth_safe = (staff.booth_id or "no_booth").replace(" ", "_")
-        location_safe = (staff.location or "loc").replace(" ", "_")
-        pass_obj.qr_code_image.save(
-            f'pass_{pass_obj.id}_{booth_safe}_{location_safe}.png',
-            File(f),
-            save=True
-        )
+    # (signed and valid for day_entered only when QR_SIGNED_PAYLOADS is on)
+    # The stored file is optional; pages link to /qr/<payload>.png instead
+    attach_qr(pass_obj, str(pass_obj.id), qrsign.pass_payload(pass_obj, staff.location))
     
-    return JsonResponse({'success': True, 'pass_id': str(pass_obj.id)})
+    metrics.PASSES_CREATED.inc()
+
+    return JsonResponse({
+        'success': True,
+        'pass_id': str(pass_obj.id),
+        'photo_bytes_saved': photo.bytes_saved if photo is not None else 0,
+    })
 
 
 @login_required
@@ -516,9 +1042,8 @@ def create_pass(request):
 def upload_staff_photo(request, staff_id):
     """
     Upload a photo for a staff member. Accepts both file upload and base64 data (from camera).
+    Either way the image goes through entrance.photos.normalize_photo.
     """
-    import base64
-    from django.core.files.base import ContentFile
     import logging
     
     logger = logging.getLogger(__name__)
@@ -532,59 +1057,53 @@ def upload_staff_photo(request, staff_id):
         
         if photo_data:
             # Handle base64 photo data from camera
+            if len(photo_data.split(',')[-1]) < 100:
+                return JsonResponse({'success': False, 'error': 'Invalid photo data provided'})
             try:
-                # Remove data URL prefix if present
-                if ',' in photo_data:
-                    photo_data = photo_data.split(',')[1]
-                
-                if not photo_data or len(photo_data) < 100:
-                    return JsonResponse({'success': False, 'error': 'Invalid photo data provided'})
-                
-                image_data = base64.b64decode(photo_data)
-                
-                if not image_data or len(image_data) < 1000:
-                    return JsonResponse({'success': False, 'error': 'Photo data too small or invalid'})
-                
-                # Delete old photo if exists
-                if staff.photo:
-                    staff.photo.delete(save=False)
-                
-                photo_file = ContentFile(image_data, name=f'staff_{staff.id}.jpg')
-                staff.photo.save(photo_file.name, photo_file, save=True)
-                
-                logger.info(f'Photo uploaded successfully for staff {staff.id}')
-                
-                return JsonResponse({
-                    'success': True,
-                    'photo_url': staff.photo.url
-                })
-            except base64.binascii.Error as e:
+                image_data = decode_data_url(photo_data)
+            except PhotoError as e:
                 logger.error(f'Base64 decode error: {str(e)}')
-                return JsonResponse({'success': False, 'error': f'Invalid photo format: {str(e)}'})
-            except Exception as e:
-                logger.error(f'Error processing photo: {str(e)}', exc_info=True)
-                return JsonResponse({'success': False, 'error': f'Error processing photo: {str(e)}'})
-        
+                return JsonResponse({'success': False, 'error': str(e)})
+
+            if not image_data or len(image_data) < 1000:
+                return JsonResponse({'success': False, 'error': 'Photo data too small or invalid'})
+
         elif photo_file:
             # Handle file upload
-            try:
-                # Delete old photo if exists
-                if staff.photo:
-                    staff.photo.delete(save=False)
-                
-                staff.photo.save(photo_file.name, photo_file, save=True)
-                
-                logger.info(f'Photo uploaded successfully for staff {staff.id}')
-                
-                return JsonResponse({
-                    'success': True,
-                    'photo_url': staff.photo.url
-                })
-            except Exception as e:
-                logger.error(f'Error saving photo file: {str(e)}', exc_info=True)
-                return JsonResponse({'success': False, 'error': f'Error saving photo: {str(e)}'})
-        
-        return JsonResponse({'success': False, 'error': 'No photo provided'})
+            image_data = photo_file.read()
+
+        else:
+            return JsonResponse({'success': False, 'error': 'No photo provided'})
+
+        try:
+            photo = normalize_photo(image_data)
+        except PhotoError as e:
+            logger.error(f'Error processing photo: {str(e)}')
+            return JsonResponse({'success': False, 'error': f'Error processing photo: {str(e)}'})
+
+        try:
+            # Delete old photo if exists
+            if staff.photo:
+                staff.photo.delete(save=False)
+
+            new_file = photo.as_file(f'staff_{staff.id}')
+            staff.photo.save(new_file.name, new_file, save=True)
+        except Exception as e:
+            logger.error(f'Error saving photo file: {str(e)}', exc_info=True)
+            return JsonResponse({'success': False, 'error': f'Error saving photo: {str(e)}'})
+
+        logger.info(
+            f'Photo uploaded successfully for staff {staff.id} '
+            f'({photo.original_bytes} -> {len(photo.data)} bytes)'
+        )
+        metrics.PHOTO_BYTES.inc('staff', 'received', amount=photo.original_bytes)
+        metrics.PHOTO_BYTES.inc('staff', 'stored', amount=len(photo.data))
+
+        return JsonResponse({
+            'success': True,
+            'photo_url': staff.photo.url,
+            'photo_bytes_saved': photo.bytes_saved,
+        })
     
     except Exception as e:
         logger.error(f'Unexpected error in upload_staff_photo: {str(e)}', exc_info=True)
@@ -0,0 +1,57 @@
+# entrance/zipstream.py
+"""
+Build a ZIP archive as a stream of byte chunks.
+
+zipfile writes to an unseekable sink using data descriptors, so entries
+can be emitted while they are read; only one read block is held in
+memory at a time regardless of how many files go into the archive.
+"""
+import zipfile
+
+
+CHUNK_SIZE = 64 * 1024
+
+
+class _Sink:
+    """
+    Minimal unseekable file object that collects what zipfile writes
+    until the generator drains it.
+    """
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def iter_zip(entries):
+    """
+    Yield the bytes of a ZIP built from entries, an iterable of
+    (arcname, path) for files on disk or (arcname, bytes) for generated
+    content. Files are stored uncompressed (PNGs do not shrink);
+    generated content is deflated.
+    """
+    sink = _Sink()
+    with zipfile.ZipFile(sink, 'w') as zf:
+        for arcname, source in entries:
+            if isinstance(source, bytes):
+                zf.writestr(arcname, source, compress_type=zipfile.ZIP_DEFLATED)
+            else:
+                info = zipfile.ZipInfo.from_file(source, arcname)
+                info.compress_type = zipfile.ZIP_STORED
+                with open(source, 'rb') as src, zf.open(info, 'w') as dst:
+                    for block in iter(lambda: src.read(CHUNK_SIZE), b''):
+                        dst.write(block)
+                        yield sink.drain()
+            yield sink.drain()
+    yield sink.drain()
@@ -0,0 +1,12 @@
+import os
+from django.core.asgi import get_asgi_application
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'event_entry.settings')
+application = get_asgi_application()
+
+# Load the staff roster before the first gate scan hits this worker
+from entrance import roster  # noqa: E402
+try:
+    roster.warm()
+except Exception:
+    # DB may not be migrated yet; roster loads lazily on first lookup
+    pass
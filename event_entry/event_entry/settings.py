@@ -1,6 +1,8 @@
 from pathlib import Path
 import os
 
+import django
+
 BASE_DIR = Path(__file__).resolve().parent.parent
 
 SECRET_KEY = 'django-insecure-replace-me-for-production'
@@ -21,6 +23,9 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'entrance.middleware.MetricsMiddleware',
+    # No-op unless REQUEST_METRICS_ENABLED
+    'entrance.middleware.RequestMetricsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -49,6 +54,12 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'event_entry.wsgi.application'
+ASGI_APPLICATION = 'event_entry.asgi.application'
+
+# Production database profile (persistent connections, IMMEDIATE
+# transactions, WAL pragmas). Off by default so dev and tests run on
+# Django's stock SQLite settings; set ENTRANCE_SQLITE_TUNING=1 to enable.
+SQLITE_TUNING = os.environ.get('ENTRANCE_SQLITE_TUNING', '') == '1'
 
 DATABASES = {
     'default': {
@@ -56,6 +67,35 @@ DATABASES = {
         'NAME': BASE_DIR / 'db.sqlite3',
     }
 }
+if SQLITE_TUNING:
+    DATABASES['default'].update({
+        # Keep connections open between requests (scanner traffic is constant)
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            # Seconds to wait for a lock before "database is locked"
+            'timeout': 20,
+        },
+    })
+    if django.VERSION >= (5, 1):
+        # Take the write lock at BEGIN so writers queue on busy_timeout
+        # instead of failing when a read transaction upgrades to a write
+        DATABASES['default']['OPTIONS']['transaction_mode'] = 'IMMEDIATE'
+
+# Pragmas of the production profile; bench_sqlite measures them either way.
+# WAL lets gate scans read while save_printed or an import is writing.
+SQLITE_TUNED_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',     # durable at checkpoints; safe with WAL
+    'busy_timeout': 20000,       # ms
+    'cache_size': -20000,        # KiB (negative), ~20 MB page cache per connection
+    'mmap_size': 268435456,      # 256 MB memory-mapped reads
+    'temp_store': 'MEMORY',
+    'foreign_keys': 'ON',        # Django's default, kept explicit
+}
+# Applied to every new SQLite connection (entrance.dbtune via connection_created).
+# Empty keeps SQLite's defaults.
+SQLITE_PRAGMAS = SQLITE_TUNED_PRAGMAS if SQLITE_TUNING else {}
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -92,4 +132,74 @@ LOGIN_URL = 'login'
 LOGIN_REDIRECT_URL = 'dashboard'
 
 # Default root for exported booth QR folders (used by export_booth_qr and UI)
-BOOTH_QR_EXPORT_ROOT = BASE_DIR / 'booth_qr_export'
\ No newline at end of file
+BOOTH_QR_EXPORT_ROOT = BASE_DIR / 'booth_qr_export'
+
+# Seconds before each worker reloads its in-memory staff roster (entrance.roster).
+# Edits made in the same worker are applied immediately via signals.
+ROSTER_CACHE_TTL = 300
+
+# Rows per dashboard page (overridable with ?page_size=, capped at DASHBOARD_MAX_PAGE_SIZE)
+DASHBOARD_PAGE_SIZE = 100
+DASHBOARD_MAX_PAGE_SIZE = 1000
+
+# Seconds before each worker rebuilds the cached booth tree (entrance.booths)
+BOOTH_TREE_CACHE_TTL = 60
+
+# Encode HMAC-signed payloads (entrance.qrsign) in newly generated QR codes so the
+# verify views can authenticate a scan without a DB lookup. Legacy UUID codes keep working.
+QR_SIGNED_PAYLOADS = False
+# Key for QR signatures; defaults to SECRET_KEY when unset
+QR_SIGNING_KEY = None
+
+# Gate scan log (entrance.scanlog): events are buffered in-process and written
+# with bulk_create every SCAN_LOG_BATCH_SIZE events or SCAN_LOG_FLUSH_MS.
+SCAN_LOG_ENABLED = True
+SCAN_LOG_BATCH_SIZE = 200
+SCAN_LOG_FLUSH_MS = 500
+SCAN_LOG_MAX_QUEUE = 50000
+
+# Pass/staff photo normalization (entrance.photos)
+PHOTO_MAX_EDGE = 800          # px, longest side
+PHOTO_QUALITY = 80            # starting encoder quality
+PHOTO_FORMAT = 'JPEG'         # or 'WEBP'
+PHOTO_MAX_BYTES = 200 * 1024  # quality/size are stepped down until the photo fits
+
+# Pass photos older than this are hidden at the gate and removed by cleanup_pass_photos
+PASS_PHOTO_TTL_HOURS = 12
+
+# Badge print sheets (entrance.badges / print_badges command)
+BADGE_FONT_PATH = None      # TrueType font for names, e.g. one covering Ethiopic script
+BADGE_SHEET_WORKERS = 1     # render processes used by the dashboard print view
+
+# Per-request instrumentation (entrance.middleware): Server-Timing header,
+# rolling per-view summary at /api/request-metrics/, repeated-SQL warnings
+REQUEST_METRICS_ENABLED = False
+REQUEST_METRICS_WINDOW = 500            # requests kept per view
+REQUEST_METRICS_REPEAT_THRESHOLD = 10   # same SQL shape more often than this is flagged
+
+# Prometheus text metrics at /metrics (entrance.metrics)
+METRICS_ENABLED = True
+METRICS_MULTIPROC_DIR = None   # shared directory to merge several worker processes, e.g. BASE_DIR / 'metrics'
+METRICS_FLUSH_SECONDS = 5      # how often each process writes its totals there
+METRICS_TOKEN = None           # if set, scrapers must send "Authorization: Bearer <token>"
+
+# QR images rendered on request at /qr/<payload>.png|svg (entrance.qrrender)
+QR_STORE_FILES = True           # keep a PNG per Staff/Pass in qr_code_image (off: render on request only)
+QR_RENDER_CACHE_SIZE = 4096     # rendered images kept per worker (LRU, ~1 KB each)
+QR_MAX_PAYLOAD_LENGTH = 512     # longer payloads are rejected with 400
+
+# Live dashboard/booth counters over Server-Sent Events at /live/ (entrance.live)
+LIVE_COALESCE_SECONDS = 0.5   # wait after a change so a burst becomes one refresh
+LIVE_POLL_SECONDS = 5         # also refresh this often while streams are open (other workers' changes)
+LIVE_HEARTBEAT_SECONDS = 15   # keep-alive comment on idle streams
+LIVE_HISTORY = 256            # events kept for reconnecting browsers (Last-Event-ID)
+LIVE_MAX_ROWS = 200           # more changed rows than this are sent as "stale_rows" instead
+LIVE_STREAM_WSGI = False      # serve /live/ under WSGI too (each open page then holds a worker thread)
+LIVE_FALLBACK_POLL_SECONDS = 15  # pages poll /live/snapshot/ this often when the stream is not served
+
+# Anti-passback and occupancy per location (entrance.occupancy)
+ANTI_PASSBACK_ENABLED = True
+ANTI_PASSBACK_BLOCK = False           # refuse repeat entries instead of flagging them
+OCCUPANCY_MAX_IDS = 500_000           # ids remembered per day (~75-80 bytes each per worker)
+OCCUPANCY_SYNC_SECONDS = 10           # merge other workers' scans from the scan log this often
+OCCUPANCY_SYNC_OVERLAP_SECONDS = 60   # history re-read per sync (scan log is written behind)
@@ -2,3 +2,11 @@ import os
 from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'event_entry.settings')
 application = get_wsgi_application()
+
+# Load the staff roster before the first gate scan hits this worker
+from entrance import roster  # noqa: E402
+try:
+    roster.warm()
+except Exception:
+    # DB may not be migrated yet; roster loads lazily on first lookup
+    pass